@@ -0,0 +1,44 @@
+"""登录视图的异步版本（ASGI 部署时使用，见 settings.DASHBOARD_ASYNC_VIEWS）
+
+哈希计算在有界线程池中进行，等待期间不占用事件循环和同步线程。
+"""
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.contrib.auth import alogin
+from django.shortcuts import render, redirect
+
+from .hashing import HashingBusy, aauthenticate_user
+from .throttling import allow_login_attempt, login_succeeded
+
+arender = sync_to_async(render)
+
+
+async def login_view(request):
+    """用户登录视图"""
+    request.user = await request.auser()
+    if request.user.is_authenticated:
+        return redirect('dashboard')  # 已登录用户直接跳转到仪表盘
+
+    if request.method == 'POST':
+        username = request.POST.get('username')
+        password = request.POST.get('password')
+
+        # 先限流再计算哈希，撞库请求不消耗 CPU
+        if not allow_login_attempt(request, username):
+            messages.error(request, '登录尝试过于频繁，请稍后再试')
+            return await arender(request, 'index.html', {'page': 'login'}, status=429)
+
+        try:
+            user = await aauthenticate_user(request, username, password)
+        except HashingBusy:
+            messages.error(request, '服务器繁忙，请稍后再试')
+            return await arender(request, 'index.html', {'page': 'login'}, status=503)
+        if user is not None:
+            await alogin(request, user)
+            login_succeeded(username)
+            messages.success(request, '登录成功！')
+            return redirect('dashboard')
+        else:
+            messages.error(request, '用户名或密码错误')
+
+    return await arender(request, 'index.html', {'page': 'login'})
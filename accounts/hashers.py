@@ -0,0 +1,11 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class ConfigurablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """迭代次数由 settings.LOGIN_PBKDF2_ITERATIONS 配置的 PBKDF2-SHA256
+
+    算法名与 Django 默认的相同，已有的哈希可以直接验证；迭代次数不一致的密码
+    在下次登录成功时由 Django 自动按新的迭代次数重新哈希。
+    """
+    iterations = getattr(settings, 'LOGIN_PBKDF2_ITERATIONS', PBKDF2PasswordHasher.iterations)
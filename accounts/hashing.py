@@ -0,0 +1,62 @@
+"""在有界线程池中计算密码哈希
+
+PBKDF2 每次需要数十毫秒 CPU。登录和注册的哈希计算统一交给固定大小的线程池，
+同一进程内同时进行的哈希数量不超过 LOGIN_HASH_WORKERS，其余请求的 CPU 不被占满；
+排队数超过 LOGIN_HASH_QUEUE 时直接拒绝（HashingBusy），不无限堆积。
+异步视图通过 await 等待结果，不占用事件循环。
+"""
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import make_password
+from django.db import close_old_connections
+
+WORKERS = getattr(settings, 'LOGIN_HASH_WORKERS', 2)
+QUEUE = getattr(settings, 'LOGIN_HASH_QUEUE', 32)
+
+_executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix='password-hash')
+_slots = threading.BoundedSemaphore(WORKERS + QUEUE)
+
+
+class HashingBusy(Exception):
+    """排队等待哈希计算的请求过多"""
+
+
+def _submit(func, *args, **kwargs):
+    if not _slots.acquire(blocking=False):
+        raise HashingBusy
+    # 复制上下文，使请求级的性能统计（见 dear_trail/instrumentation.py）包含线程池中的查询
+    context = contextvars.copy_context()
+
+    def run():
+        close_old_connections()
+        try:
+            return context.run(func, *args, **kwargs)
+        finally:
+            close_old_connections()
+
+    try:
+        future = _executor.submit(run)
+    except BaseException:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    return future
+
+
+def authenticate_user(request, username, password):
+    """在线程池中验证用户名密码；哈希算法或迭代次数过期时验证成功后自动重新哈希"""
+    return _submit(authenticate, request, username=username, password=password).result()
+
+
+async def aauthenticate_user(request, username, password):
+    return await asyncio.wrap_future(_submit(authenticate, request, username=username, password=password))
+
+
+def hash_password(password):
+    """在线程池中计算密码哈希（注册时使用）"""
+    return _submit(make_password, password).result()
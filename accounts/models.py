@@ -1,10 +1,13 @@
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
 class UserProfile(models.Model):
     """用户个人资料模型，扩展Django内置用户模型"""
+    # 可编辑的资料字段，保存时只写入发生变化的字段
+    PROFILE_FIELDS = ('phone', 'avatar', 'bio')
+
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile', verbose_name="用户")
     phone = models.CharField(max_length=11, blank=True, null=True, verbose_name="手机号")
     avatar = models.ImageField(upload_to='avatars/', blank=True, null=True, verbose_name="头像")
@@ -24,23 +27,63 @@ class UserProfile(models.Model):
         if self.phone and (len(self.phone) != 11 or not self.phone.isdigit()):
             raise ValidationError({"phone": "手机号必须是11位数字"})
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded = instance._profile_values()
+        return instance
+
+    def _profile_values(self):
+        return {
+            'phone': self.phone,
+            'avatar': self.avatar.name or None,
+            'bio': self.bio,
+        }
+
+    def changed_fields(self):
+        """相对于从数据库读取时发生变化的资料字段"""
+        loaded = getattr(self, '_loaded', None)
+        if loaded is None:
+            return list(self.PROFILE_FIELDS)
+        current = self._profile_values()
+        return [name for name in self.PROFILE_FIELDS if current[name] != loaded[name]]
+
     def save(self, *args, **kwargs):
+        loaded = getattr(self, '_loaded', None)
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            changed = self.changed_fields()
+            if not changed:
+                # 资料没有变化，不写数据库
+                return
+            kwargs['update_fields'] = changed + ['updated_at']
         try:
-            self.full_clean()
+            # user 由代码设置，一对一唯一性由数据库约束保证，不再额外查询
+            self.full_clean(exclude=['user'], validate_unique=False)
             super().save(*args, **kwargs)
         except Exception as e:
             print(f"保存用户资料失败: {e}")
             raise
+        # 更换头像后，旧头像文件在事务提交后删除
+        if loaded and loaded['avatar'] and loaded['avatar'] != self.avatar.name:
+            from dashboard.media_files import delete_files_on_commit
+            delete_files_on_commit(loaded['avatar'])
+        self._loaded = self._profile_values()
 
-# 信号：当用户创建时自动创建个人资料
+# 信号：用户创建时自动创建个人资料（登录、修改用户名等普通保存不再写资料表）
+# 注册视图在事务中创建用户，资料与用户一同提交
 @receiver(post_save, sender=User)
-def create_user_profile(sender, instance, created,** kwargs):
-    if created:
+def create_user_profile(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
         UserProfile.objects.create(user=instance)
 
-@receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    try:
-        instance.profile.save()
-    except Exception:
-        UserProfile.objects.create(user=instance)
+# 信号：头像保存后在后台生成缩略图（原图未变化时不会重复生成）
+@receiver(post_save, sender=UserProfile)
+def generate_avatar_thumbnails(sender, instance, **kwargs):
+    from dashboard.thumbnails import schedule_thumbnails
+    schedule_thumbnails(instance.avatar)
+
+# 信号：删除资料（随用户一起删除）后，在事务提交时删除头像及其缩略图
+@receiver(post_delete, sender=UserProfile)
+def delete_avatar_file(sender, instance, **kwargs):
+    from dashboard.media_files import delete_field_files_on_commit
+    delete_field_files_on_commit(instance)
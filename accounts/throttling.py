@@ -0,0 +1,82 @@
+"""登录限流：按 IP 和用户名的令牌桶
+
+在计算密码哈希之前检查，撞库请求被拒绝时不消耗 CPU。令牌桶保存在进程内存中，
+每个进程独立计数；键数量有上限，超出时淘汰最久未使用的。
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+# (令牌桶容量, 填满所需秒数)：容量即允许的突发次数
+IP_RATE = getattr(settings, 'LOGIN_THROTTLE_IP', (20, 60))
+USERNAME_RATE = getattr(settings, 'LOGIN_THROTTLE_USERNAME', (5, 60))
+# 为 True 时从 X-Forwarded-For 取客户端 IP（仅在可信的反向代理之后启用）
+TRUST_FORWARDED_FOR = getattr(settings, 'LOGIN_TRUST_X_FORWARDED_FOR', False)
+MAX_KEYS = 10000
+
+
+class TokenBucket:
+    __slots__ = ('tokens', 'updated')
+
+    def __init__(self, tokens, updated):
+        self.tokens = tokens
+        self.updated = updated
+
+
+class Throttle:
+    """按键计数的令牌桶集合（线程安全）"""
+
+    def __init__(self, capacity, period, max_keys=MAX_KEYS):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def allow(self, key, now=None):
+        """消耗一个令牌，令牌不足时返回 False"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.capacity, now)
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket.tokens = min(self.capacity, bucket.tokens + (now - bucket.updated) * self.rate)
+                bucket.updated = now
+            if bucket.tokens < 1:
+                return False
+            bucket.tokens -= 1
+            return True
+
+    def reset(self, key):
+        with self._lock:
+            self._buckets.pop(key, None)
+
+
+ip_throttle = Throttle(*IP_RATE)
+username_throttle = Throttle(*USERNAME_RATE)
+
+
+def client_ip(request):
+    if TRUST_FORWARDED_FOR:
+        forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+        if forwarded:
+            return forwarded.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def allow_login_attempt(request, username):
+    """检查并记录一次登录尝试；IP 已超限时不再消耗用户名的令牌"""
+    if not ip_throttle.allow(client_ip(request)):
+        return False
+    return username_throttle.allow((username or '').lower())
+
+
+def login_succeeded(username):
+    """登录成功后清除该用户名的计数，之前输错密码不影响之后的登录"""
+    username_throttle.reset((username or '').lower())
@@ -1,9 +1,13 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import views, async_views
+
+# ASGI 部署时登录使用异步版本（见 async_views.py）
+login_view = async_views.login_view if getattr(settings, 'DASHBOARD_ASYNC_VIEWS', False) else views.login_view
 
 urlpatterns = [
     path('register/', views.register_view, name='register'),
-    path('login/', views.login_view, name='login'),
+    path('login/', login_view, name='login'),
     path('logout/', views.logout_view, name='logout'),
     path('profile/', views.profile_view, name='profile'),
 ]
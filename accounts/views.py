@@ -1,7 +1,11 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth.models import User
-from django.contrib.auth import login, authenticate, logout
+from django.contrib.auth import login, logout
 from django.contrib import messages
+from django.db import transaction
+
+from .hashing import HashingBusy, authenticate_user, hash_password
+from .throttling import allow_login_attempt, login_succeeded
 
 
 def login_view(request):
@@ -13,10 +17,20 @@ def login_view(request):
         username = request.POST.get('username')
         password = request.POST.get('password')
 
-        # 验证用户
-        user = authenticate(request, username=username, password=password)
+        # 先限流再计算哈希，撞库请求不消耗 CPU
+        if not allow_login_attempt(request, username):
+            messages.error(request, '登录尝试过于频繁，请稍后再试')
+            return render(request, 'index.html', {'page': 'login'}, status=429)
+
+        # 验证用户（哈希计算在有界线程池中进行）
+        try:
+            user = authenticate_user(request, username, password)
+        except HashingBusy:
+            messages.error(request, '服务器繁忙，请稍后再试')
+            return render(request, 'index.html', {'page': 'login'}, status=503)
         if user is not None:
             login(request, user)
+            login_succeeded(username)
             messages.success(request, '登录成功！')
             return redirect('dashboard')
         else:
@@ -36,6 +50,10 @@ def register_view(request):
         password1 = request.POST.get('password1')
         password2 = request.POST.get('password2')
 
+        if not allow_login_attempt(request, username):
+            messages.error(request, '注册尝试过于频繁，请稍后再试')
+            return redirect('register')
+
         # 表单验证
         if password1 != password2:
             messages.error(request, '两次密码输入不一致')
@@ -49,15 +67,19 @@ def register_view(request):
             messages.error(request, '邮箱已被注册')
             return redirect('register')
 
-        # 创建用户（使用create_user避免last_login错误）
+        # 创建用户：密码先在有界线程池中哈希，个人资料由信号在同一事务中创建
         try:
-            user = User.objects.create_user(
-                username=username,
-                email=email,
-                password=password1
-            )
+            password = hash_password(password1)
+            with transaction.atomic():
+                user = User.objects.create(
+                    username=User.normalize_username(username),
+                    email=User.objects.normalize_email(email),
+                    password=password
+                )
             messages.success(request, '注册成功，请登录')
             return redirect('login')
+        except HashingBusy:
+            messages.error(request, '服务器繁忙，请稍后再试')
         except Exception as e:
             messages.error(request, f'注册失败：{str(e)}')
 
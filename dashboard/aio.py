@@ -0,0 +1,30 @@
+"""异步视图的数据库查询辅助
+
+Django 的异步 ORM（aget、aexists、async for 等）内部通过 sync_to_async 在同一个
+线程中依次执行，同一请求内的多个查询并不会真正并发。run_query 把查询放到线程池中
+（thread_sensitive=False），每个工作线程使用各自的数据库连接，配合 asyncio.gather
+让同一请求内互不依赖的查询同时执行。
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+
+def _call(func, args):
+    # 工作线程不经过请求开始/结束信号，需自行按 CONN_MAX_AGE 关闭过期或失效的连接
+    close_old_connections()
+    try:
+        return func(*args)
+    finally:
+        close_old_connections()
+
+
+async def run_query(func, *args):
+    """在线程池中执行一次同步的数据库操作"""
+    return await sync_to_async(_call, thread_sensitive=False)(func, args)
+
+
+async def gather_queries(*funcs):
+    """并发执行多个互不依赖的查询，按参数顺序返回结果"""
+    return await asyncio.gather(*(run_query(func) for func in funcs))
@@ -0,0 +1,153 @@
+"""仪表盘页面视图的异步版本（ASGI 部署时使用）
+
+与 views.py 中的同名视图行为一致，通过 settings.DASHBOARD_ASYNC_VIEWS 在 urls.py 中切换。
+同一请求内互不依赖的查询用 asyncio.gather 并发执行，见 aio.py。
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.core.exceptions import ValidationError
+from django.shortcuts import render, redirect
+from django.utils import timezone
+
+from .aio import run_query
+from .cache import aget_dashboard_summary, aget_location_choices
+from .conditional import conditional_page
+from .models import Location, CheckIn, Activity
+from .pagination import paginate_request
+
+# 模板渲染仍是同步代码（上下文处理器、消息框架），放到同步线程中执行
+arender = sync_to_async(render)
+
+
+async def _auser(request):
+    # 替换掉 request.user 的惰性对象，避免模板渲染时再次查询用户
+    request.user = user = await request.auser()
+    return user
+
+
+@login_required
+async def dashboard_view(request):
+    """仪表盘首页视图"""
+    user = await _auser(request)
+    today = timezone.localdate()
+    summary = await aget_dashboard_summary(user, today)
+
+    return await arender(request, 'dashboard/index.html', {
+        'user': user,
+        'page': 'dashboard',
+        'checkin_status': summary['checkin_status'],
+        'checkin_stats': summary['checkin_stats'],
+        'recent_location': summary['recent_location'],
+        'recent_activities': summary['recent_activities']
+    })
+
+
+@login_required
+@conditional_page((Location, 'updated_at'))
+async def location_view(request):
+    """地址管理视图"""
+    user = await _auser(request)
+    if request.method == 'POST':
+        try:
+            location = Location(
+                user=user,
+                name=request.POST.get('name'),
+                address=request.POST.get('address'),
+                latitude=request.POST.get('latitude') or None,
+                longitude=request.POST.get('longitude') or None,
+                is_default=request.POST.get('is_default') == 'on'
+            )
+            await run_query(location.save)
+            messages.success(request, '地址添加成功！')
+            return redirect('location')
+        except Exception as e:
+            messages.error(request, f'添加失败: {str(e)}')
+
+    locations = await run_query(paginate_request, request, Location.objects.filter(user=user), 'created_at')
+
+    return await arender(request, 'dashboard/location.html', {
+        'user': user,
+        'page': 'location',
+        'locations': locations
+    })
+
+
+@login_required
+async def checkin_view(request):
+    """打卡视图"""
+    user = await _auser(request)
+    today = timezone.localdate()
+
+    if request.method == 'POST':
+        try:
+            checkin = CheckIn(
+                user=user,
+                location_id=request.POST.get('location_id') or None,
+                status=request.POST.get('status', 'completed'),
+                notes=request.POST.get('notes')
+            )
+            await run_query(checkin.save)
+            messages.success(request, '今日打卡成功！')
+            return redirect('dashboard')
+        except ValidationError as e:
+            if getattr(e, 'code', None) == 'duplicate_checkin':
+                messages.info(request, '您今天已经打卡了！')
+                return redirect('dashboard')
+            messages.error(request, f'打卡失败: {str(e)}')
+        except Exception as e:
+            messages.error(request, f'打卡失败: {str(e)}')
+        locations = await aget_location_choices(user)
+    else:
+        # 今日是否已打卡与地址列表同时查询
+        checked_in, locations = await asyncio.gather(
+            run_query(CheckIn.objects.filter(user=user, checkin_date=today).exists),
+            aget_location_choices(user),
+        )
+        if checked_in:
+            messages.info(request, '您今天已经打卡了！')
+            return redirect('dashboard')
+
+    return await arender(request, 'dashboard/checkin.html', {
+        'user': user,
+        'page': 'checkin',
+        'locations': locations
+    })
+
+
+@login_required
+@conditional_page((Activity, 'created_at'), (Location, 'updated_at'))
+async def activity_view(request):
+    """活动记录视图"""
+    user = await _auser(request)
+    if request.method == 'POST':
+        try:
+            activity = Activity(
+                user=user,
+                title=request.POST.get('title'),
+                category=request.POST.get('category', 'other'),
+                description=request.POST.get('description'),
+                location_id=request.POST.get('location_id') or None,
+                start_time=request.POST.get('start_time'),
+                end_time=request.POST.get('end_time')
+            )
+            await run_query(activity.save)
+            messages.success(request, '活动记录添加成功！')
+            return redirect('activity')
+        except Exception as e:
+            messages.error(request, f'添加失败: {str(e)}')
+
+    # 活动分页与地址下拉列表同时查询
+    activities, locations = await asyncio.gather(
+        run_query(paginate_request, request, Activity.objects.filter(user=user), 'start_time'),
+        aget_location_choices(user),
+    )
+
+    return await arender(request, 'dashboard/activity.html', {
+        'user': user,
+        'page': 'activity',
+        'activities': activities,
+        'locations': locations
+    })
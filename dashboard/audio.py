@@ -0,0 +1,493 @@
+"""音频元数据与波形峰值
+
+新的音频内容（AudioBlob）创建后，在事务提交时交给后台线程解析容器头部：
+WAV（RIFF 的 fmt / data 块）、FLAC（STREAMINFO / PICTURE 块）、
+MP3（ID3v2 标签和第一个 MPEG 帧，VBR 文件读取 Xing / Info / VBRI 中的帧数）、
+MP4 / M4A（moov 中的 mvhd、mdhd、stsd 和 covr），得到时长、比特率、采样率、声道数和内嵌封面。
+只读取文件头部，不解码音频。
+
+WAV（PCM）另外用 NumPy 计算 PEAK_BUCKETS 段的峰值，每段一个字节（0~255，相对满幅），
+存入 AudioBlob.peaks。音乐库页面只需读取数据库即可显示时长和波形。
+已有音频可用 python manage.py extract_audio_metadata 补齐。
+"""
+import logging
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+try:
+    import numpy as np
+except ImportError:  # numpy 为可选依赖，未安装时不计算波形
+    np = None
+
+logger = logging.getLogger(__name__)
+
+PEAK_BUCKETS = getattr(settings, 'AUDIO_PEAK_BUCKETS', 800)
+# ID3 标签、FLAC 元数据块中最多读取的字节数（内嵌封面通常在 1MB 以内）
+MAX_TAG_BYTES = 16 * 1024 * 1024
+# 计算峰值时每次处理的帧数，限制内存占用
+PEAK_CHUNK_FRAMES = 1 << 20
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class AudioInfo:
+    """解析结果，未能得到的项为 None"""
+
+    def __init__(self, format):
+        self.format = format
+        self.duration = None
+        self.bitrate = None
+        self.sample_rate = None
+        self.channels = None
+        self.cover = None
+        self.peaks = None
+
+
+def _image_extension(data):
+    if data.startswith(b'\xff\xd8'):
+        return 'jpg'
+    if data.startswith(b'\x89PNG'):
+        return 'png'
+    return None
+
+
+# ---- WAV ----
+
+def _parse_wav(f, path, size, info):
+    f.seek(12)
+    fmt = None
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        chunk_id, chunk_size = struct.unpack('<4sI', header)
+        if chunk_id == b'fmt ':
+            data = f.read(chunk_size)
+            if len(data) < 16:
+                return
+            audio_format, channels, sample_rate, byte_rate, _, bits = struct.unpack('<HHIIHH', data[:16])
+            if audio_format == 0xFFFE and len(data) >= 26:
+                # WAVE_FORMAT_EXTENSIBLE：实际格式在子格式 GUID 的前两个字节
+                audio_format = struct.unpack('<H', data[24:26])[0]
+            fmt = (audio_format, channels, bits)
+            info.channels, info.sample_rate = channels, sample_rate
+            info.bitrate = byte_rate * 8
+            f.seek(chunk_size & 1, 1)
+        elif chunk_id == b'data':
+            offset = f.tell()
+            data_size = min(chunk_size, size - offset)
+            if fmt is None:
+                return
+            if info.bitrate:
+                info.duration = data_size * 8 / info.bitrate
+            if fmt[0] in (1, 3):
+                info.peaks = wav_peaks(path, offset, data_size, *fmt)
+            return
+        else:
+            f.seek(chunk_size + (chunk_size & 1), 1)
+
+
+def wav_peaks(path, offset, size, audio_format, channels, bits, buckets=PEAK_BUCKETS):
+    """PCM 数据的分段峰值（最多 buckets 段，各声道取绝对值最大），返回 bytes；未安装 numpy 时返回 None"""
+    if np is None or not channels or bits not in (8, 16, 24, 32, 64):
+        return None
+    width = bits // 8
+    frame_bytes = width * channels
+    frames = size // frame_bytes
+    if not frames:
+        return b''
+    if audio_format == 3:
+        if width not in (4, 8):
+            return None
+        dtype, scale = ('<f4' if width == 4 else '<f8'), 1.0
+    else:
+        dtype, scale = {1: ('u1', 128.0), 2: ('<i2', 32768.0), 3: (None, 8388608.0),
+                        4: ('<i4', 2147483648.0)}.get(width, (None, None))
+        if scale is None:
+            return None
+
+    raw = np.memmap(path, dtype=np.uint8, mode='r', offset=offset, shape=(frames * frame_bytes,))
+
+    center = 128.0 if width == 1 else 0.0
+
+    def decode(start, end):
+        """[start, end) 帧的样本（各声道交错），保持原始类型"""
+        block = raw[start * frame_bytes:end * frame_bytes]
+        if width != 3:
+            return block.view(dtype)
+        b = block.reshape(-1, 3).astype(np.int32)
+        samples = b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)
+        return np.where(samples & 0x800000, samples - 0x1000000, samples)
+
+    def peak(samples, axis=None):
+        # 直接在原始类型上求最大和最小值，比先转换成浮点再取绝对值快得多
+        high = samples.max(axis=axis).astype(np.float64) - center
+        low = center - samples.min(axis=axis).astype(np.float64)
+        return np.maximum(high, low)
+
+    # 每段 bucket 帧，最后一段可能不足，因此段数不超过 buckets
+    bucket = -(-frames // buckets)
+    out = np.zeros(-(-frames // bucket), dtype=np.float64)
+    step = max(1, PEAK_CHUNK_FRAMES // bucket) * bucket
+    for start in range(0, frames, step):
+        samples = decode(start, min(start + step, frames))
+        count = len(samples) // channels
+        index = start // bucket
+        full = count // bucket * bucket
+        if full:
+            out[index:index + full // bucket] = peak(samples[:full * channels].reshape(-1, bucket * channels), axis=1)
+        if count > full:
+            out[index + full // bucket] = peak(samples[full * channels:])
+    del raw
+    return np.clip(np.rint(out / scale * 255), 0, 255).astype(np.uint8).tobytes()
+
+
+# ---- FLAC ----
+
+def _parse_flac_picture(data):
+    """PICTURE 块，返回 (图片类型, 图片数据)"""
+    picture_type, mime_length = struct.unpack('>II', data[:8])
+    pos = 8 + mime_length
+    description_length = struct.unpack('>I', data[pos:pos + 4])[0]
+    pos += 4 + description_length + 16
+    data_length = struct.unpack('>I', data[pos:pos + 4])[0]
+    return picture_type, data[pos + 4:pos + 4 + data_length]
+
+
+def _parse_flac(f, size, info):
+    f.seek(4)
+    cover_type = None
+    while True:
+        header = f.read(4)
+        if len(header) < 4:
+            break
+        last, block_type = header[0] & 0x80, header[0] & 0x7F
+        length = int.from_bytes(header[1:4], 'big')
+        if block_type == 0 and length >= 18:
+            data = f.read(length)
+            info.sample_rate = int.from_bytes(data[10:13], 'big') >> 4
+            info.channels = ((data[12] >> 1) & 0x07) + 1
+            total_samples = int.from_bytes(data[13:18], 'big') & 0xFFFFFFFFF
+            if info.sample_rate and total_samples:
+                info.duration = total_samples / info.sample_rate
+        elif block_type == 6 and length <= MAX_TAG_BYTES and cover_type != 3:
+            # 优先使用封面（图片类型 3），其次是第一张图片
+            try:
+                picture_type, picture = _parse_flac_picture(f.read(length))
+            except struct.error:
+                picture_type, picture = None, None
+            if picture and (info.cover is None or picture_type == 3):
+                info.cover, cover_type = picture, picture_type
+        else:
+            f.seek(length, 1)
+        if last:
+            break
+    if info.duration:
+        info.bitrate = int(size * 8 / info.duration)
+
+
+# ---- MP3 ----
+
+_MPEG_BITRATES = {
+    (3, 3): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (3, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (3, 1): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 3): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (2, 1): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_MPEG_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+
+def _syncsafe(data):
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+
+def _mpeg_header(data):
+    """解析 4 字节的 MPEG 音频帧头，无效时返回 None"""
+    if data[0] != 0xFF or data[1] & 0xE0 != 0xE0:
+        return None
+    version, layer = (data[1] >> 3) & 0x03, (data[1] >> 1) & 0x03
+    bitrate_index, rate_index = data[2] >> 4, (data[2] >> 2) & 0x03
+    if version == 1 or layer == 0 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    bitrate = _MPEG_BITRATES[(3 if version == 3 else 2, layer)][bitrate_index] * 1000
+    sample_rate = _MPEG_SAMPLE_RATES[version][rate_index]
+    if layer == 3:
+        samples_per_frame = 384
+    elif layer == 2 or version == 3:
+        samples_per_frame = 1152
+    else:
+        samples_per_frame = 576
+    channels = 1 if data[3] >> 6 == 3 else 2
+    return version, bitrate, sample_rate, samples_per_frame, channels
+
+
+def _split_terminated(data, encoding):
+    """按编码拆分以 0 结尾的字符串，返回其后的数据"""
+    if encoding in (1, 2):
+        pos = 0
+        while True:
+            pos = data.find(b'\x00\x00', pos)
+            if pos < 0:
+                return b''
+            if pos % 2 == 0:
+                return data[pos + 2:]
+            pos += 1
+    pos = data.find(b'\x00')
+    return data[pos + 1:] if pos >= 0 else b''
+
+
+def _parse_id3(tag, version, flags, info):
+    """从 ID3v2 标签中读取封面（APIC / PIC 帧）"""
+    if version < 4 and flags & 0x80:
+        tag = tag.replace(b'\xff\x00', b'\xff')
+    pos = 0
+    if flags & 0x40 and len(tag) >= 4:
+        # 扩展头：v2.4 的长度包含自身，v2.3 不包含
+        pos = _syncsafe(tag[:4]) if version == 4 else struct.unpack('>I', tag[:4])[0] + 4
+    header_size = 6 if version == 2 else 10
+    cover_type = None
+    while pos + header_size <= len(tag):
+        if version == 2:
+            frame_id, frame_size = tag[pos:pos + 3], int.from_bytes(tag[pos + 3:pos + 6], 'big')
+        else:
+            frame_id = tag[pos:pos + 4]
+            frame_size = _syncsafe(tag[pos + 4:pos + 8]) if version == 4 else struct.unpack('>I', tag[pos + 4:pos + 8])[0]
+        if not frame_id.strip(b'\x00') or frame_size <= 0:
+            break
+        body = tag[pos + header_size:pos + header_size + frame_size]
+        pos += header_size + frame_size
+        if frame_id == b'APIC' and len(body) > 2:
+            encoding = body[0]
+            rest = body[1:]
+            rest = rest[rest.find(b'\x00') + 1:]  # MIME 类型
+            picture_type, picture = rest[0], _split_terminated(rest[1:], encoding)
+        elif frame_id == b'PIC' and len(body) > 5:
+            encoding, picture_type = body[0], body[4]
+            picture = _split_terminated(body[5:], encoding)
+        else:
+            continue
+        if picture and cover_type != 3 and (info.cover is None or picture_type == 3):
+            info.cover, cover_type = picture, picture_type
+
+
+def _parse_mp3(f, size, info):
+    f.seek(0)
+    header = f.read(10)
+    audio_start = 0
+    if header[:3] == b'ID3' and len(header) == 10:
+        version, flags = header[3], header[5]
+        tag_size = _syncsafe(header[6:10])
+        audio_start = 10 + tag_size + (10 if flags & 0x10 else 0)
+        if tag_size <= MAX_TAG_BYTES:
+            _parse_id3(f.read(tag_size), version, flags, info)
+
+    f.seek(audio_start)
+    buf = f.read(64 * 1024)
+    position = frame = None
+    for i in range(len(buf) - 3):
+        if buf[i] == 0xFF:
+            frame = _mpeg_header(buf[i:i + 4])
+            if frame is not None:
+                position = i
+                break
+    if frame is None:
+        return
+    version, bitrate, sample_rate, samples_per_frame, channels = frame
+    info.sample_rate, info.channels = sample_rate, channels
+
+    # VBR 文件的第一帧为 Xing / Info 或 VBRI 帧，记录了总帧数
+    side_info = (32 if channels == 2 else 17) if version == 3 else (17 if channels == 2 else 9)
+    frames = None
+    xing = position + 4 + side_info
+    if buf[xing:xing + 4] in (b'Xing', b'Info') and struct.unpack('>I', buf[xing + 4:xing + 8])[0] & 1:
+        frames = struct.unpack('>I', buf[xing + 8:xing + 12])[0]
+    elif buf[position + 36:position + 40] == b'VBRI':
+        frames = struct.unpack('>I', buf[position + 50:position + 54])[0]
+
+    audio_size = size - audio_start - position
+    f.seek(max(size - 128, 0))
+    if f.read(3) == b'TAG':
+        audio_size -= 128
+    if frames:
+        info.duration = frames * samples_per_frame / sample_rate
+        info.bitrate = int(audio_size * 8 / info.duration) if info.duration else bitrate
+    else:
+        info.bitrate = bitrate
+        info.duration = audio_size * 8 / bitrate
+
+
+# ---- MP4 / M4A ----
+
+def _atoms(f, start, end):
+    """遍历 [start, end) 范围内的 atom，产生 (类型, 数据开始, 数据结束)"""
+    pos = start
+    while pos + 8 <= end:
+        f.seek(pos)
+        size, kind = struct.unpack('>I4s', f.read(8))
+        header_size = 8
+        if size == 1:
+            size = struct.unpack('>Q', f.read(8))[0]
+            header_size = 16
+        elif size == 0:
+            size = end - pos
+        if size < header_size:
+            return
+        yield kind, pos + header_size, min(pos + size, end)
+        pos += size
+
+
+def _find(f, start, end, *path):
+    """按路径查找子 atom，返回 (数据开始, 数据结束) 或 None"""
+    for kind, data_start, data_end in _atoms(f, start, end):
+        if kind == path[0]:
+            return (data_start, data_end) if len(path) == 1 else _find(f, data_start, data_end, *path[1:])
+    return None
+
+
+def _read_timescale_duration(f, start):
+    f.seek(start)
+    version = f.read(4)[0]
+    if version == 1:
+        f.seek(16, 1)
+        timescale, duration = struct.unpack('>IQ', f.read(12))
+    else:
+        f.seek(8, 1)
+        timescale, duration = struct.unpack('>II', f.read(8))
+    return duration / timescale if timescale else None
+
+
+def _parse_mp4(f, size, info):
+    moov = _find(f, 0, size, b'moov')
+    if moov is None:
+        return
+    mvhd = _find(f, *moov, b'mvhd')
+    if mvhd:
+        info.duration = _read_timescale_duration(f, mvhd[0])
+
+    for kind, start, end in _atoms(f, *moov):
+        if kind != b'trak':
+            continue
+        hdlr = _find(f, start, end, b'mdia', b'hdlr')
+        if hdlr is None:
+            continue
+        f.seek(hdlr[0] + 8)
+        if f.read(4) != b'soun':
+            continue
+        mdhd = _find(f, start, end, b'mdia', b'mdhd')
+        if mdhd:
+            info.duration = _read_timescale_duration(f, mdhd[0]) or info.duration
+        stsd = _find(f, start, end, b'mdia', b'minf', b'stbl', b'stsd')
+        if stsd:
+            # stsd：版本和标志 4 字节、条目数 4 字节，之后是第一个音频样本描述
+            f.seek(stsd[0] + 8 + 8 + 16)
+            channels, _, _, _, sample_rate = struct.unpack('>HHHHI', f.read(12))
+            info.channels, info.sample_rate = channels, sample_rate >> 16
+        break
+
+    # 封面：moov/udta/meta/ilst/covr/data，meta 是带版本和标志的 full atom
+    meta = _find(f, *moov, b'udta', b'meta') or _find(f, *moov, b'meta')
+    if meta:
+        data = _find(f, meta[0] + 4, meta[1], b'ilst', b'covr', b'data')
+        if data and data[1] - data[0] - 8 <= MAX_TAG_BYTES:
+            f.seek(data[0] + 8)
+            info.cover = f.read(data[1] - data[0] - 8)
+    if info.duration:
+        info.bitrate = int(size * 8 / info.duration)
+
+
+def read_audio_info(path):
+    """解析音频文件头部，无法识别的格式返回 None"""
+    with open(path, 'rb') as f:
+        f.seek(0, 2)
+        size = f.tell()
+        f.seek(0)
+        head = f.read(12)
+        if head[:4] == b'RIFF' and head[8:12] == b'WAVE':
+            info = AudioInfo('wav')
+            _parse_wav(f, path, size, info)
+        elif head[:4] == b'fLaC':
+            info = AudioInfo('flac')
+            _parse_flac(f, size, info)
+        elif head[4:8] == b'ftyp':
+            info = AudioInfo('mp4')
+            _parse_mp4(f, size, info)
+        elif head[:3] == b'ID3' or (len(head) >= 2 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0):
+            info = AudioInfo('mp3')
+            _parse_mp3(f, size, info)
+        else:
+            return None
+    if info.cover is not None and _image_extension(info.cover) is None:
+        info.cover = None
+    return info
+
+
+def extract_blob_metadata(blob_id):
+    """解析 AudioBlob 的元数据并保存；有内嵌封面时设为引用该音频且没有封面的音乐的封面"""
+    from .models import AudioBlob, Music
+    from .thumbnails import generate_variants
+
+    blob = AudioBlob.objects.filter(pk=blob_id).first()
+    if blob is None:
+        return None
+    try:
+        info = read_audio_info(default_storage.path(blob.file.name))
+    except (OSError, struct.error, ValueError, IndexError) as e:
+        logger.warning("解析音频元数据失败 %s: %s", blob.file.name, e)
+        info = None
+
+    fields = {'metadata_at': timezone.now()}
+    cover_name = None
+    if info is not None:
+        fields.update(
+            format=info.format,
+            duration=info.duration,
+            bitrate=info.bitrate,
+            sample_rate=info.sample_rate,
+            channels=info.channels,
+            peaks=info.peaks,
+        )
+        if info.cover:
+            name = f'music_covers/embedded/{blob.sha256}.{_image_extension(info.cover)}'
+            cover_name = name if default_storage.exists(name) else default_storage.save(name, ContentFile(info.cover))
+            fields['cover_image'] = cover_name
+    AudioBlob.objects.filter(pk=blob_id).update(**fields)
+    if cover_name:
+        Music.objects.filter(blob_id=blob_id).filter(
+            Q(cover_image='') | Q(cover_image__isnull=True)
+        ).update(cover_image=cover_name)
+        generate_variants(cover_name)
+    return info
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='audio-metadata')
+        return _executor
+
+
+def _run(blob_id):
+    close_old_connections()
+    try:
+        extract_blob_metadata(blob_id)
+    except Exception:
+        logger.exception("提取音频元数据失败: %s", blob_id)
+    finally:
+        close_old_connections()
+
+
+def schedule_metadata(blob_id):
+    """在事务提交后于后台线程解析音频元数据"""
+    transaction.on_commit(lambda: _get_executor().submit(_run, blob_id))
@@ -0,0 +1,145 @@
+"""HTTP 压测工具：多线程长连接发送请求，统计吞吐量和延迟分位数
+
+只依赖标准库，供 bench_servers、bench_urls 等管理命令使用。
+"""
+import http.client
+import importlib
+import itertools
+import math
+import re
+import socket
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+
+_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+def percentile(sorted_values, p):
+    """最近秩法计算分位数（输入需已升序）"""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(p / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies, elapsed, errors=0):
+    """延迟样本（秒）汇总为 rps、p50/p95/p99（毫秒）"""
+    values = sorted(latencies)
+
+    def ms(value):
+        return round(value * 1000, 2) if value is not None else None
+
+    return {
+        'requests': len(values),
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'rps': round(len(values) / elapsed, 1) if elapsed else None,
+        'p50_ms': ms(percentile(values, 50)),
+        'p95_ms': ms(percentile(values, 95)),
+        'p99_ms': ms(percentile(values, 99)),
+        'max_ms': ms(values[-1] if values else None),
+    }
+
+
+def server_timing_queries(header):
+    """从 Server-Timing 响应头（见 PerformanceMiddleware）读取 SQL 次数，没有时返回 None"""
+    match = _QUERIES.search(header or '')
+    return int(match.group(1)) if match else None
+
+
+def session_cookie(user):
+    """直接为用户创建登录会话，返回 Cookie 请求头的值"""
+    store = importlib.import_module(settings.SESSION_ENGINE).SessionStore()
+    store[SESSION_KEY] = str(user.pk)
+    store[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+    store[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    store.create()
+    return f'{settings.SESSION_COOKIE_NAME}={store.session_key}'
+
+
+def wait_for_port(host, port, timeout=30):
+    """等待服务器开始监听端口"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def run_client(client, path, iterations):
+    """用 Django 测试客户端串行请求 path，返回 summarize() 的结果，另加最后的状态码和平均 SQL 次数"""
+    latencies, queries, errors, status = [], [], 0, None
+    started = time.perf_counter()
+    for _ in range(iterations):
+        begin = time.perf_counter()
+        response = client.get(path)
+        if response.streaming:
+            # 流式响应需要读完内容才算完成
+            for _chunk in response.streaming_content:
+                pass
+        latencies.append(time.perf_counter() - begin)
+        status = response.status_code
+        if status >= 400:
+            errors += 1
+        count = server_timing_queries(response.get('Server-Timing'))
+        if count is not None:
+            queries.append(count)
+    result = summarize(latencies, time.perf_counter() - started, errors)
+    result['status'] = status
+    result['queries'] = round(sum(queries) / len(queries), 1) if queries else None
+    return result
+
+
+def run_load(base_url, paths, total, concurrency, headers=None, on_response=None):
+    """对 paths 轮流发送 total 个 GET 请求，concurrency 个线程各用一个长连接
+
+    on_response(path, response) 可读取响应头（如 Server-Timing）；
+    返回 summarize() 的结果，状态码 >= 400 或连接错误计为 errors。
+    """
+    url = urlsplit(base_url)
+    headers = dict(headers or {})
+    counter = itertools.count()
+    cycle = itertools.cycle(paths)
+    lock = threading.Lock()
+    latencies, errors = [], [0]
+
+    def worker():
+        conn = http.client.HTTPConnection(url.hostname, url.port, timeout=30)
+        own, failed = [], 0
+        while next(counter) < total:
+            with lock:
+                path = next(cycle)
+            started = time.perf_counter()
+            try:
+                conn.request('GET', url.path.rstrip('/') + path, headers=headers)
+                response = conn.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                conn.close()
+                conn = http.client.HTTPConnection(url.hostname, url.port, timeout=30)
+                continue
+            own.append(time.perf_counter() - started)
+            if response.status >= 400:
+                failed += 1
+            if on_response is not None:
+                on_response(path, response)
+        conn.close()
+        with lock:
+            latencies.extend(own)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(latencies, time.perf_counter() - started, errors[0])
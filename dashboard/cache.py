@@ -0,0 +1,179 @@
+"""仪表盘按用户版本号缓存
+
+每个用户有一个版本号，缓存键形如 dashboard:<用户id>:v<版本>:<片段名>。
+Location / CheckIn / Activity 保存或删除时递增版本号（见 models.py 中的信号），
+旧版本的键不再被读取，由缓存过期自然淘汰，无需逐个删除。
+版本号键本身不过期，但仍可能被缓存淘汰；重新生成时取当前纳秒时间戳而不是从 1 开始，
+不会与仍留在缓存中的旧片段的版本重复。热力图和音乐搜索的版本号也使用 get_version / bump_version。
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+CACHE_ALIAS = getattr(settings, 'DASHBOARD_CACHE_ALIAS', 'default')
+CACHE_TIMEOUT = getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 300)
+
+_stats = {'hits': 0, 'misses': 0}
+_stats_lock = threading.Lock()
+
+
+def dashboard_cache():
+    return caches[CACHE_ALIAS]
+
+
+def _version_key(user_id):
+    return f'dashboard:{user_id}:version'
+
+
+def get_version(key):
+    """读取版本号，不存在（首次使用或已被淘汰）时以当前纳秒时间戳初始化"""
+    cache = dashboard_cache()
+    version = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        cache.add(key, version, timeout=None)
+        version = cache.get(key, version)
+    return version
+
+
+def bump_version(key):
+    """递增版本号；不存在时写入新的纳秒时间戳"""
+    cache = dashboard_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+async def aget_version(key):
+    cache = dashboard_cache()
+    version = await cache.aget(key)
+    if version is None:
+        version = time.time_ns()
+        await cache.aadd(key, version, timeout=None)
+        version = await cache.aget(key, version)
+    return version
+
+
+def get_user_version(user_id):
+    """读取用户当前缓存版本号"""
+    return get_version(_version_key(user_id))
+
+
+def bump_user_version(user_id):
+    """递增用户缓存版本号，使该用户的全部缓存片段失效"""
+    bump_version(_version_key(user_id))
+
+
+def _record(hit):
+    with _stats_lock:
+        _stats['hits' if hit else 'misses'] += 1
+
+
+def cache_stats():
+    """返回本进程的缓存命中统计"""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_cache_stats():
+    with _stats_lock:
+        _stats['hits'] = _stats['misses'] = 0
+
+
+def cached_fragment(user_id, name, builder, timeout=CACHE_TIMEOUT):
+    """读取用户缓存片段，未命中时调用 builder() 生成并写入"""
+    cache = dashboard_cache()
+    key = f'dashboard:{user_id}:v{get_user_version(user_id)}:{name}'
+    sentinel = object()
+    value = cache.get(key, sentinel)
+    if value is not sentinel:
+        _record(hit=True)
+        return value
+    _record(hit=False)
+    value = builder()
+    cache.set(key, value, timeout)
+    return value
+
+
+def get_location_choices(user):
+    """地址下拉列表（id / name / address），用于打卡和活动表单"""
+    from .models import Location
+
+    return cached_fragment(
+        user.pk,
+        'location_choices',
+        lambda: list(Location.objects.filter(user=user).values('id', 'name', 'address')),
+    )
+
+
+def _summary_parts(user, today):
+    """首页数据的各项查询，互不依赖，{名称: 无参函数}"""
+    from .models import Location, CheckIn, Activity
+    from .stats import get_user_stats
+
+    return {
+        'checkin_stats': lambda: get_user_stats(user, today),
+        'checkin_status': lambda: "已完成" if CheckIn.objects.filter(
+            user=user,
+            checkin_date=today
+        ).exists() else "未完成",
+        'recent_location': lambda: Location.objects.filter(user=user).order_by('-created_at').first(),
+        'recent_activities': lambda: list(Activity.objects.filter(user=user).order_by('-start_time')[:3]),
+    }
+
+
+def get_dashboard_summary(user, today):
+    """仪表盘首页数据：今日打卡状态、打卡统计、最近地址、最近3条活动"""
+    parts = _summary_parts(user, today)
+
+    # 键中带上日期，跨天后自动重新计算打卡状态
+    return cached_fragment(
+        user.pk,
+        f'summary:{today.isoformat()}',
+        lambda: {name: query() for name, query in parts.items()},
+    )
+
+
+async def aget_user_version(user_id):
+    return await aget_version(_version_key(user_id))
+
+
+async def acached_fragment(user_id, name, builder, timeout=CACHE_TIMEOUT):
+    """cached_fragment 的异步版本，builder 为协程函数"""
+    cache = dashboard_cache()
+    key = f'dashboard:{user_id}:v{await aget_user_version(user_id)}:{name}'
+    sentinel = object()
+    value = await cache.aget(key, sentinel)
+    if value is not sentinel:
+        _record(hit=True)
+        return value
+    _record(hit=False)
+    value = await builder()
+    await cache.aset(key, value, timeout)
+    return value
+
+
+async def aget_location_choices(user):
+    from .aio import run_query
+    from .models import Location
+
+    return await acached_fragment(
+        user.pk,
+        'location_choices',
+        lambda: run_query(lambda: list(Location.objects.filter(user=user).values('id', 'name', 'address'))),
+    )
+
+
+async def aget_dashboard_summary(user, today):
+    """get_dashboard_summary 的异步版本：未命中缓存时各项查询并发执行"""
+    from .aio import gather_queries
+
+    parts = _summary_parts(user, today)
+
+    async def build():
+        return dict(zip(parts, await gather_queries(*parts.values())))
+
+    return await acached_fragment(user.pk, f'summary:{today.isoformat()}', build)
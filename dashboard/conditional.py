@@ -0,0 +1,98 @@
+"""列表页面的条件请求（ETag / Last-Modified → 304）
+
+地址、活动、音乐页面在渲染前先对每种数据各用一条聚合查询算出该用户的校验值
+（条数、最大 id、最近修改时间），与浏览器带来的 If-None-Match / If-Modified-Since
+相同时直接返回 304，不查询列表也不渲染模板。响应带 Cache-Control: private, no-cache，
+浏览器每次打开页面都会重新验证，不会在数据变化后继续显示旧页面。
+
+ETag 还包含仪表盘缓存版本号（信号在修改和删除时递增，见 cache.py）和 CSRF 密钥，
+重新登录后不会复用带旧 CSRF 令牌的页面。删除记录不改变最近修改时间，只体现在 ETag 的
+条数中；浏览器同时发送两个请求头，此时以 If-None-Match 为准。
+"""
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.contrib import messages
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .aio import run_query
+from .cache import get_user_version
+
+# 修改页面模板并部署后更改此值，使浏览器中缓存的旧页面失效
+ETAG_SALT = getattr(settings, 'PAGE_ETAG_SALT', '')
+
+
+def page_validators(request, sources):
+    """计算 (ETag, 最近修改时间)；不适用条件请求时返回 None
+
+    sources 为 [(模型, 时间字段)]，每个模型执行一条按用户过滤的聚合查询。
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    # 有待显示的提示消息时必须返回完整页面（len 不会把消息标记为已读）
+    if len(messages.get_messages(request)):
+        return None
+    # 还没有 CSRF cookie 时本次响应会设置新的，此时的 ETag 下次请求必然不匹配
+    csrf_secret = request.META.get('CSRF_COOKIE')
+    if not csrf_secret:
+        return None
+    user = request.user
+    parts = [ETAG_SALT, str(user.pk), user.username, str(get_user_version(user.pk))]
+    last_modified = None
+    for model, field in sources:
+        row = model.objects.filter(user=user).aggregate(count=Count('id'), last_id=Max('id'), latest=Max(field))
+        parts.append(f"{model._meta.model_name}:{row['count']}:{row['last_id']}:{row['latest']}")
+        if row['latest'] and (last_modified is None or row['latest'] > last_modified):
+            last_modified = row['latest']
+    parts.append(csrf_secret)
+    etag = '"%s"' % hashlib.md5('|'.join(parts).encode(), usedforsecurity=False).hexdigest()
+    # HTTP 日期只精确到秒
+    return etag, int(last_modified.timestamp()) if last_modified else None
+
+
+def _not_modified(request, validators):
+    if validators is None:
+        return None
+    etag, last_modified = validators
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    return _add_validators(response, validators) if response is not None else None
+
+
+def _add_validators(response, validators):
+    if validators is not None and response.status_code in (200, 304):
+        etag, last_modified = validators
+        response.headers.setdefault('ETag', etag)
+        if last_modified is not None:
+            response.headers.setdefault('Last-Modified', http_date(last_modified))
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def conditional_page(*sources):
+    """视图装饰器：数据未变化时返回 304，放在 login_required 之后（内层）
+
+    用法：@conditional_page((Location, 'updated_at'))
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def inner(request, *args, **kwargs):
+                validators = await run_query(page_validators, request, sources)
+                response = _not_modified(request, validators)
+                if response is None:
+                    response = _add_validators(await view(request, *args, **kwargs), validators)
+                return response
+        else:
+            @wraps(view)
+            def inner(request, *args, **kwargs):
+                validators = page_validators(request, sources)
+                response = _not_modified(request, validators)
+                if response is None:
+                    response = _add_validators(view(request, *args, **kwargs), validators)
+                return response
+        return inner
+    return decorator
@@ -0,0 +1,133 @@
+"""流式导出用户足迹（CSV / NDJSON / GeoJSON）
+
+按主键分批读取（WHERE id > 上一批最后的 id LIMIT n），每批通过 values() 一次性
+连接 Location 取出坐标，没有 N+1 查询，也不依赖数据库驱动是否支持服务端游标；
+无论记录多少，内存中只保留一批数据。
+"""
+import csv
+import json
+
+from django.utils import timezone
+
+from .models import Activity, CheckIn
+
+CHUNK_SIZE = 2000
+FORMATS = ('csv', 'ndjson', 'geojson')
+KINDS = ('all', 'activity', 'checkin')
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+    'geojson': 'application/geo+json',
+}
+COLUMNS = [
+    'type', 'id', 'time', 'end_time', 'title', 'category', 'status', 'notes',
+    'location', 'latitude', 'longitude',
+]
+
+LOCATION_FIELDS = ('location__name', 'location__latitude', 'location__longitude')
+ACTIVITY_FIELDS = ('id', 'title', 'category', 'description', 'start_time', 'end_time') + LOCATION_FIELDS
+CHECKIN_FIELDS = ('id', 'status', 'notes', 'created_at') + LOCATION_FIELDS
+
+
+def _iter_values(queryset, fields, chunk_size):
+    """按主键分批产出 values() 字典"""
+    last_id = 0
+    while True:
+        batch = list(queryset.filter(id__gt=last_id).order_by('id').values(*fields)[:chunk_size])
+        if not batch:
+            return
+        yield from batch
+        last_id = batch[-1]['id']
+
+
+def _local(value):
+    return timezone.localtime(value).isoformat()
+
+
+def _number(value):
+    return float(value) if value is not None else None
+
+
+def iter_records(user, kind='all', chunk_size=CHUNK_SIZE):
+    """产出统一格式的足迹记录（dict，键为 COLUMNS）"""
+    if kind in ('all', 'activity'):
+        for row in _iter_values(Activity.objects.filter(user=user), ACTIVITY_FIELDS, chunk_size):
+            yield {
+                'type': 'activity',
+                'id': row['id'],
+                'time': _local(row['start_time']),
+                'end_time': _local(row['end_time']),
+                'title': row['title'],
+                'category': row['category'],
+                'status': None,
+                'notes': row['description'],
+                'location': row['location__name'],
+                'latitude': _number(row['location__latitude']),
+                'longitude': _number(row['location__longitude']),
+            }
+    if kind in ('all', 'checkin'):
+        for row in _iter_values(CheckIn.objects.filter(user=user), CHECKIN_FIELDS, chunk_size):
+            yield {
+                'type': 'checkin',
+                'id': row['id'],
+                'time': _local(row['created_at']),
+                'end_time': None,
+                'title': None,
+                'category': None,
+                'status': row['status'],
+                'notes': row['notes'],
+                'location': row['location__name'],
+                'latitude': _number(row['location__latitude']),
+                'longitude': _number(row['location__longitude']),
+            }
+
+
+class _Echo:
+    """供 csv.writer 使用的伪文件，write() 直接返回写入的内容"""
+
+    def write(self, value):
+        return value
+
+
+def _csv_lines(records):
+    writer = csv.writer(_Echo())
+    # 带 BOM 方便 Excel 正确识别中文
+    yield '\ufeff' + writer.writerow(COLUMNS)
+    for record in records:
+        yield writer.writerow(['' if record[c] is None else record[c] for c in COLUMNS])
+
+
+def _ndjson_lines(records):
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + '\n'
+
+
+def _geojson_lines(records):
+    yield '{"type":"FeatureCollection","features":['
+    first = True
+    for record in records:
+        if record['latitude'] is None or record['longitude'] is None:
+            continue
+        properties = {k: v for k, v in record.items() if k not in ('latitude', 'longitude')}
+        feature = {
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [record['longitude'], record['latitude']]},
+            'properties': properties,
+        }
+        yield ('' if first else ',') + json.dumps(feature, ensure_ascii=False)
+        first = False
+    yield ']}\n'
+
+
+def export_lines(user, fmt, kind='all', chunk_size=CHUNK_SIZE):
+    """按格式产出导出内容（字符串片段）"""
+    if fmt not in FORMATS:
+        raise ValueError(f"不支持的导出格式: {fmt}")
+    if kind not in KINDS:
+        raise ValueError(f"不支持的导出类型: {kind}")
+    records = iter_records(user, kind, chunk_size)
+    if fmt == 'csv':
+        return _csv_lines(records)
+    if fmt == 'ndjson':
+        return _ndjson_lines(records)
+    return _geojson_lines(records)
@@ -0,0 +1,155 @@
+"""地址的空间查询（geohash 网格 + haversine 精确过滤）
+
+Location 保存时根据经纬度写入 geohash 列，并建有 (user, geohash) 索引。
+查询先计算覆盖目标范围的若干网格，以前缀匹配 geohash LIKE 'wx4g%' 走索引粗筛，
+再在 Python 中按 haversine 距离精确过滤。MySQL 和 SQLite 均可使用，不依赖 PostGIS。
+不使用 geohash >= 'wx4g' AND geohash < 'wx4g~' 这样的区间：MySQL 默认的 utf8mb4 排序规则
+把 '~' 等标点排在字母和数字之前，区间上界会小于所有以该前缀开头的 geohash。
+"""
+import math
+
+from django.db.models import Q
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+PRECISION = 12
+EARTH_RADIUS_KM = 6371.0088
+# 单次查询最多覆盖的网格数，超出时改用更粗的精度
+MAX_CELLS = 16
+
+
+def encode(latitude, longitude, precision=PRECISION):
+    """经纬度编码为 geohash"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        if even:
+            mid = (lon_range[0] + lon_range[1]) / 2
+            if longitude >= mid:
+                bits = bits * 2 + 1
+                lon_range[0] = mid
+            else:
+                bits = bits * 2
+                lon_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if latitude >= mid:
+                bits = bits * 2 + 1
+                lat_range[0] = mid
+            else:
+                bits = bits * 2
+                lat_range[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits, bit_count = 0, 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """指定精度下单个网格的 (纬度跨度, 经度跨度)，单位为度"""
+    lat_bits = precision * 5 // 2
+    lon_bits = precision * 5 - lat_bits
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """两点间的大圆距离（千米）"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _split_bbox(min_lat, min_lon, max_lat, max_lon):
+    """裁剪纬度范围，跨越180度经线时拆成两个矩形"""
+    min_lat, max_lat = max(min_lat, -90.0), min(max_lat, 90.0)
+    if max_lon - min_lon >= 360:
+        return [(min_lat, -180.0, max_lat, 180.0)]
+    min_lon = (min_lon + 180) % 360 - 180
+    max_lon = (max_lon + 180) % 360 - 180
+    if min_lon <= max_lon:
+        return [(min_lat, min_lon, max_lat, max_lon)]
+    return [(min_lat, min_lon, max_lat, 180.0), (min_lat, -180.0, max_lat, max_lon)]
+
+
+def covering_cells(min_lat, min_lon, max_lat, max_lon):
+    """覆盖矩形范围的 geohash 前缀集合"""
+    boxes = _split_bbox(min_lat, min_lon, max_lat, max_lon)
+    for precision in range(PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        spans = []
+        for lat0, lon0, lat1, lon1 in boxes:
+            rows = range(math.floor((lat0 + 90) / height), math.floor((min(lat1, 89.999999) + 90) / height) + 1)
+            cols = range(math.floor((lon0 + 180) / width), math.floor((min(lon1, 179.999999) + 180) / width) + 1)
+            spans.append((rows, cols))
+        if sum(len(rows) * len(cols) for rows, cols in spans) <= MAX_CELLS:
+            break
+    else:
+        return {''}
+
+    cells = set()
+    for rows, cols in spans:
+        for row in rows:
+            for col in cols:
+                center_lat = (row + 0.5) * height - 90
+                center_lon = (col + 0.5) * width - 180
+                cells.add(encode(center_lat, center_lon, precision))
+    return cells
+
+
+def cells_filter(cells):
+    """geohash 前缀集合转换为可走索引的前缀查询条件（LIKE 'prefix%'）"""
+    condition = Q()
+    for cell in cells:
+        if not cell:
+            return Q(geohash__gt='')
+        # MySQL 上 startswith 生成 LIKE BINARY，istartswith 才是按列排序规则的普通 LIKE，可走索引；
+        # geohash 全为小写字母和数字，忽略大小写不影响结果
+        condition |= Q(geohash__istartswith=cell)
+    return condition
+
+
+def _with_distance(locations, latitude, longitude):
+    result = []
+    for location in locations:
+        location.distance_km = haversine_km(
+            latitude, longitude, float(location.latitude), float(location.longitude)
+        )
+        result.append(location)
+    return result
+
+
+def locations_in_bbox(queryset, min_lat, min_lon, max_lat, max_lon):
+    """矩形范围内的地址（min_lon > max_lon 表示跨越180度经线）"""
+    cells = covering_cells(min_lat, min_lon, max_lat, max_lon)
+    boxes = _split_bbox(min_lat, min_lon, max_lat, max_lon)
+    return [
+        location for location in queryset.filter(cells_filter(cells)).order_by()
+        if any(lat0 <= float(location.latitude) <= lat1 and lon0 <= float(location.longitude) <= lon1
+               for lat0, lon0, lat1, lon1 in boxes)
+    ]
+
+
+def locations_within_radius(queryset, latitude, longitude, radius_km):
+    """距离 (latitude, longitude) 不超过 radius_km 的地址，按距离升序，附带 distance_km 属性"""
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = math.cos(math.radians(latitude))
+    if cos_lat < 1e-6 or abs(latitude) + dlat >= 90:
+        # 范围包含极点时覆盖全部经度
+        dlon = 180.0
+    else:
+        dlon = math.degrees(radius_km / (EARTH_RADIUS_KM * cos_lat))
+    cells = covering_cells(latitude - dlat, longitude - dlon, latitude + dlat, longitude + dlon)
+    candidates = _with_distance(queryset.filter(cells_filter(cells)).order_by(), latitude, longitude)
+    return sorted((loc for loc in candidates if loc.distance_km <= radius_km), key=lambda loc: loc.distance_km)
+
+
+def nearest_locations(queryset, latitude, longitude, limit=10, start_radius_km=1.0):
+    """最近的 limit 个地址；从小半径开始逐步扩大，直到找到足够数量或覆盖全球"""
+    radius = start_radius_km
+    while True:
+        found = locations_within_radius(queryset, latitude, longitude, radius)
+        if len(found) >= limit or radius >= math.pi * EARTH_RADIUS_KM:
+            return found[:limit]
+        radius *= 4
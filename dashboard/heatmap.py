@@ -0,0 +1,131 @@
+"""活动日历热力图
+
+在数据库中按本地日期（TIME_ZONE）和类别分组，统计每天的活动次数与总时长，
+以按天排列的紧凑数组返回。结果按月缓存：已结束的月份写入后不再过期，
+只有当前月份（及以后）每次重新计算；补录或修改历史活动时递增该用户的历史版本号，
+使已缓存的月份失效。
+"""
+from datetime import date, datetime, time, timedelta
+
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .cache import bump_version, dashboard_cache, get_version
+from .models import Activity
+
+CATEGORIES = [category for category, _ in Activity.CATEGORY_CHOICES]
+
+
+def _history_key(user_id):
+    return f'heatmap:{user_id}:history'
+
+
+def get_history_version(user_id):
+    # 月份缓存不过期，版本号被淘汰后以纳秒时间戳重新生成，不会命中旧版本下的月份
+    return get_version(_history_key(user_id))
+
+
+def bump_history_version(user_id):
+    """历史月份的数据发生变化时调用，使已缓存的月份全部失效"""
+    bump_version(_history_key(user_id))
+
+
+def touches_history(start_time, today=None):
+    """活动开始时间是否落在已结束的月份"""
+    today = today or timezone.localdate()
+    if timezone.is_naive(start_time):
+        # 表单提交的时间不带时区，按当前时区解释（与写入数据库时一致）
+        start_time = timezone.make_aware(start_time)
+    return timezone.localtime(start_time).date() < today.replace(day=1)
+
+
+def _month_start(year, month):
+    return date(year, month, 1)
+
+
+def _next_month(day):
+    return (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def _aware(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _aggregate(user, start, end):
+    """数据库中按 (本地日期, 类别) 分组，返回 {月份: {类别: {日期字符串: [次数, 秒数]}}}"""
+    duration = ExpressionWrapper(F('end_time') - F('start_time'), output_field=DurationField())
+    rows = (
+        Activity.objects
+        .filter(user=user, start_time__gte=_aware(start), start_time__lt=_aware(end))
+        .annotate(day=TruncDate('start_time', tzinfo=timezone.get_current_timezone()))
+        .values('day', 'category')
+        .annotate(count=Count('id'), duration=Sum(duration))
+        .order_by()
+    )
+    months = {}
+    for row in rows:
+        day = row['day']
+        seconds = int(row['duration'].total_seconds()) if row['duration'] else 0
+        months.setdefault(day.replace(day=1), {}).setdefault(row['category'], {})[day.isoformat()] = [
+            row['count'], seconds
+        ]
+    return months
+
+
+def month_buckets(user, year, today=None):
+    """返回一年中每个月的分组数据 {月份: {类别: {日期: [次数, 秒数]}}}"""
+    today = today or timezone.localdate()
+    current_month = today.replace(day=1)
+    cache = dashboard_cache()
+    history = get_history_version(user.pk)
+
+    months = [_month_start(year, m) for m in range(1, 13)]
+    keys = {month: f'heatmap:{user.pk}:h{history}:{month:%Y-%m}' for month in months if month < current_month}
+    cached = cache.get_many(list(keys.values()))
+
+    result, missing = {}, []
+    for month in months:
+        key = keys.get(month)
+        if key is not None and key in cached:
+            result[month] = cached[key]
+        else:
+            missing.append(month)
+
+    if missing:
+        # 缺失的月份合并为一个区间查询
+        computed = _aggregate(user, missing[0], _next_month(missing[-1]))
+        to_cache = {}
+        for month in missing:
+            result[month] = computed.get(month, {})
+            if month in keys:
+                to_cache[keys[month]] = result[month]
+        if to_cache:
+            cache.set_many(to_cache, timeout=None)
+    return result
+
+
+def year_heatmap(user, year, today=None):
+    """一年的热力图数据：每个类别一组按天排列的次数和时长（秒）数组"""
+    start = date(year, 1, 1)
+    days = (date(year + 1, 1, 1) - start).days
+    counts = {category: [0] * days for category in CATEGORIES}
+    durations = {category: [0] * days for category in CATEGORIES}
+
+    for buckets in month_buckets(user, year, today).values():
+        for category, per_day in buckets.items():
+            if category not in counts:
+                continue
+            for day, (count, seconds) in per_day.items():
+                index = (date.fromisoformat(day) - start).days
+                counts[category][index] = count
+                durations[category][index] = seconds
+
+    return {
+        'year': year,
+        'start': start.isoformat(),
+        'days': days,
+        'categories': CATEGORIES,
+        'count': counts,
+        'duration': durations,
+    }
@@ -0,0 +1,216 @@
+"""批量导入活动和打卡记录（CSV / NDJSON）
+
+逐行流式解析，按批校验后用 bulk_create 写入，每批一个事务。
+校验不再逐条调用 full_clean()：地点归属对照预先加载的地址id集合，
+打卡日期对照预先加载的已打卡日期集合，均在内存中完成。
+"""
+import csv
+import io
+import json
+
+from django.db import transaction, IntegrityError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .cache import bump_user_version
+from .heatmap import bump_history_version
+from .models import Activity, CheckIn, Location
+from .stats import rebuild_stats
+
+BATCH_SIZE = 1000
+KINDS = ('activity', 'checkin')
+
+ACTIVITY_CATEGORIES = dict(Activity.CATEGORY_CHOICES)
+CHECKIN_STATUSES = dict(CheckIn.STATUS_CHOICES)
+
+
+class ImportResult:
+    """导入结果：成功条数与被拒绝的行"""
+
+    def __init__(self):
+        self.created = 0
+        self.rejected = []  # [(行号, 错误信息), ...]
+
+    def reject(self, line_no, message):
+        self.rejected.append((line_no, message))
+
+    def as_dict(self, max_errors=100):
+        return {
+            'created': self.created,
+            'rejected': len(self.rejected),
+            'errors': [{'line': line, 'error': error} for line, error in self.rejected[:max_errors]],
+        }
+
+    def write_report(self, fileobj):
+        """将被拒绝的行写为CSV错误报告"""
+        writer = csv.writer(fileobj)
+        writer.writerow(['line', 'error'])
+        writer.writerows(self.rejected)
+
+
+def iter_rows(fileobj, fmt):
+    """逐行读取 CSV 或 NDJSON，产出 (行号, dict)；fileobj 为二进制文件对象"""
+    text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == 'ndjson':
+        for line_no, line in enumerate(text, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                yield line_no, None
+                continue
+            yield line_no, row if isinstance(row, dict) else None
+    else:
+        raise ValueError(f"不支持的格式: {fmt}")
+
+
+def guess_format(filename):
+    return 'ndjson' if filename.lower().endswith(('.ndjson', '.jsonl', '.json')) else 'csv'
+
+
+def _parse_time(value):
+    if not value:
+        return None
+    value = parse_datetime(str(value).strip())
+    if value is not None and timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
+
+
+def _text(row, key, label):
+    """读取文本字段：缺失时为空串，NDJSON 中的数字、列表等非字符串值视为错误行"""
+    value = row.get(key)
+    if value is None:
+        return ''
+    if not isinstance(value, str):
+        raise ValueError(f"{label}必须是字符串")
+    return value
+
+
+def _location_id(row, location_ids):
+    value = row.get('location_id')
+    if value in (None, ''):
+        return None
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("location_id 必须是整数")
+    if value not in location_ids:
+        raise ValueError("地点必须是用户自己创建的地址")
+    return value
+
+
+def _build_activity(user, row, location_ids):
+    title = _text(row, 'title', "活动标题").strip()
+    if not title or len(title) > 200:
+        raise ValueError("活动标题不能为空且不超过200字")
+    category = _text(row, 'category', "活动类别") or 'other'
+    if category not in ACTIVITY_CATEGORIES:
+        raise ValueError(f"未知的活动类别: {category}")
+    start_time = _parse_time(row.get('start_time'))
+    end_time = _parse_time(row.get('end_time'))
+    if start_time is None or end_time is None:
+        raise ValueError("开始时间和结束时间格式错误")
+    if start_time > end_time:
+        raise ValueError("开始时间不能晚于结束时间")
+    return Activity(
+        user=user,
+        title=title,
+        category=category,
+        description=_text(row, 'description', "活动描述") or None,
+        location_id=_location_id(row, location_ids),
+        start_time=start_time,
+        end_time=end_time,
+        created_at=_parse_time(row.get('created_at')) or timezone.now(),
+    )
+
+
+def _build_checkin(user, row, location_ids, checkin_dates):
+    created_at = _parse_time(row.get('created_at'))
+    if created_at is None:
+        raise ValueError("打卡时间格式错误")
+    status = _text(row, 'status', "打卡状态") or 'completed'
+    if status not in CHECKIN_STATUSES:
+        raise ValueError(f"未知的打卡状态: {status}")
+    checkin_date = timezone.localdate(created_at)
+    if checkin_date in checkin_dates:
+        raise ValueError(f"{checkin_date} 已经打卡，不能重复打卡")
+    checkin = CheckIn(
+        user=user,
+        location_id=_location_id(row, location_ids),
+        status=status,
+        notes=_text(row, 'notes', "备注") or None,
+        created_at=created_at,
+        checkin_date=checkin_date,
+    )
+    checkin_dates.add(checkin_date)
+    return checkin
+
+
+def _flush(model, batch, result):
+    """写入一批 (行号, 对象)；与并发写入冲突时逐条重试，冲突行记入错误报告"""
+    if not batch:
+        return
+    try:
+        with transaction.atomic():
+            model.objects.bulk_create([obj for _, obj in batch])
+        result.created += len(batch)
+    except IntegrityError:
+        for line_no, obj in batch:
+            try:
+                with transaction.atomic():
+                    model.objects.bulk_create([obj])
+                result.created += 1
+            except IntegrityError as e:
+                result.reject(line_no, f"写入失败: {e}")
+    batch.clear()
+
+
+def import_records(user, kind, rows, batch_size=BATCH_SIZE):
+    """校验并批量写入 rows（iter_rows 的输出），返回 ImportResult"""
+    if kind not in KINDS:
+        raise ValueError(f"不支持的导入类型: {kind}")
+
+    result = ImportResult()
+    location_ids = set(Location.objects.filter(user=user).values_list('id', flat=True))
+    checkin_dates = None
+    if kind == 'checkin':
+        checkin_dates = set(
+            CheckIn.objects.filter(user=user, checkin_date__isnull=False).values_list('checkin_date', flat=True)
+        )
+    model = Activity if kind == 'activity' else CheckIn
+
+    batch = []
+    try:
+        for line_no, row in rows:
+            if row is None:
+                result.reject(line_no, "无法解析的行")
+                continue
+            try:
+                if kind == 'activity':
+                    obj = _build_activity(user, row, location_ids)
+                else:
+                    obj = _build_checkin(user, row, location_ids, checkin_dates)
+            except ValueError as e:
+                result.reject(line_no, str(e))
+                continue
+            batch.append((line_no, obj))
+            if len(batch) >= batch_size:
+                _flush(model, batch, result)
+        _flush(model, batch, result)
+    finally:
+        # bulk_create 不触发 post_save 信号，手动使缓存失效并重建打卡统计；
+        # 中途出错时已提交的批次同样需要失效
+        if result.created:
+            if kind == 'checkin':
+                rebuild_stats([user.pk])
+            else:
+                bump_history_version(user.pk)
+            bump_user_version(user.pk)
+    return result
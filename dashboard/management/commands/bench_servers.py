@@ -0,0 +1,110 @@
+"""对比 ASGI（uvicorn + 异步视图）与 WSGI（gunicorn / waitress + 同步视图）的吞吐量和延迟
+
+用法：python manage.py bench_servers [--requests 2000] [--concurrency 32] [--path /location/ ...]
+
+依次以子进程启动两种服务器（使用当前的 settings 和数据库），以同一个测试用户的会话
+对仪表盘页面发压，输出每秒请求数和 p50/p95/p99 延迟。需要安装 uvicorn，以及
+gunicorn（Linux）或 waitress（Windows）之一。
+"""
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.benchmark import run_load, session_cookie, wait_for_port
+
+DEFAULT_PATHS = ['/', '/location/', '/checkin/', '/activity/']
+HOST = '127.0.0.1'
+
+
+def _installed(module):
+    return importlib.util.find_spec(module) is not None
+
+
+class Command(BaseCommand):
+    help = "对比 uvicorn（异步视图）与 WSGI 服务器（同步视图）的吞吐量和 p99 延迟"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help="每种服务器发送的请求数")
+        parser.add_argument('--concurrency', type=int, default=32, help="并发连接数")
+        parser.add_argument('--path', action='append', dest='paths', help="压测路径，可重复指定")
+        parser.add_argument('--user', default='bench', help="压测使用的用户名（不存在时创建）")
+        parser.add_argument('--port', type=int, default=8701, help="服务器监听端口")
+        parser.add_argument('--workers', type=int, default=1, help="服务器进程数")
+        parser.add_argument('--threads', type=int, default=8, help="WSGI 服务器每进程线程数")
+        parser.add_argument('--json', action='store_true', help="以 JSON 输出结果")
+
+    def handle(self, *args, **options):
+        if not _installed('uvicorn'):
+            raise CommandError("未安装 uvicorn")
+        wsgi_server = next((name for name in ('gunicorn', 'waitress') if _installed(name)), None)
+        if wsgi_server is None:
+            raise CommandError("未安装 gunicorn 或 waitress")
+
+        cookie = self._session_cookie(options['user'])
+        paths = options['paths'] or DEFAULT_PATHS
+        port, workers, threads = str(options['port']), str(options['workers']), str(options['threads'])
+
+        servers = {
+            'asgi-uvicorn': (
+                [sys.executable, '-m', 'uvicorn', 'dear_trail.asgi:application',
+                 '--host', HOST, '--port', port, '--workers', workers, '--no-access-log'],
+                '1',
+            ),
+        }
+        if wsgi_server == 'gunicorn':
+            command = [sys.executable, '-m', 'gunicorn', 'dear_trail.wsgi:application',
+                       '--bind', f'{HOST}:{port}', '--workers', workers, '--threads', threads]
+        else:
+            command = [sys.executable, '-m', 'waitress', f'--listen={HOST}:{port}',
+                       f'--threads={threads}', 'dear_trail.wsgi:application']
+        servers[f'wsgi-{wsgi_server}'] = (command, '0')
+
+        results = {}
+        for name, (command, async_views) in servers.items():
+            results[name] = self._bench(name, command, async_views, paths, cookie, options)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, ensure_ascii=False, indent=2))
+            return
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:16} {result['rps']:>8} req/s  p50 {result['p50_ms']} ms  "
+                f"p95 {result['p95_ms']} ms  p99 {result['p99_ms']} ms  错误 {result['errors']}"
+            )
+
+    def _session_cookie(self, username):
+        """为压测用户直接创建会话，返回 Cookie 请求头"""
+        user, created = User.objects.get_or_create(username=username)
+        if created:
+            user.set_unusable_password()
+            user.save()
+        return session_cookie(user)
+
+    def _bench(self, name, command, async_views, paths, cookie, options):
+        env = dict(os.environ, DASHBOARD_ASYNC_VIEWS=async_views)
+        env.setdefault('DJANGO_SETTINGS_MODULE', 'dear_trail.settings')
+        process = subprocess.Popen(
+            command, env=env, cwd=settings.BASE_DIR,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            if not wait_for_port(HOST, options['port']):
+                raise CommandError(f"{name} 启动失败")
+            base_url = f"http://{HOST}:{options['port']}"
+            headers = {'Cookie': cookie}
+            # 预热：建立数据库连接、填充缓存和模板
+            run_load(base_url, paths, len(paths) * 4, 1, headers)
+            self.stderr.write(f"正在压测 {name} ...")
+            return run_load(base_url, paths, options['requests'], options['concurrency'], headers)
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
@@ -0,0 +1,135 @@
+"""对比仪表盘各页面的模板渲染耗时：不缓存 / 缓存加载器 / 缓存加载器 + 片段缓存
+
+用法：
+    python manage.py seed_data --users 10
+    python manage.py bench_templates --user seed_0000 [--iterations 200]
+
+先用测试客户端请求每个页面一次，取得视图实际传给模板的上下文，之后只计时模板部分：
+- parse：每次重新读取并解析模板（相当于未启用缓存加载器），片段缓存为空
+- cached：缓存加载器，片段缓存为空（每次都渲染侧边栏和移动端菜单并写入缓存）
+- fragments：缓存加载器，片段缓存命中（稳定运行时的情况）
+"""
+import time
+from contextlib import contextmanager
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.core.management.base import BaseCommand, CommandError
+from django.template import Context, Engine
+from django.template.base import Template
+from django.test import Client
+from django.test.utils import instrumented_test_render
+from django.urls import reverse
+
+from dashboard.benchmark import percentile
+
+PAGES = {
+    'dashboard': 'dashboard/index.html',
+    'location': 'dashboard/location.html',
+    'checkin': 'dashboard/checkin.html',
+    'activity': 'dashboard/activity.html',
+}
+FRAGMENTS = ['dashboard_sidebar', 'dashboard_mobile_nav']
+BASE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+
+@contextmanager
+def _capture_context():
+    """临时启用测试客户端的模板上下文记录（response.context）"""
+    original = Template._render
+    Template._render = instrumented_test_render
+    try:
+        yield
+    finally:
+        Template._render = original
+
+
+def _engine(cached):
+    configured = Engine.get_default()
+    loaders = [('django.template.loaders.cached.Loader', BASE_LOADERS)] if cached else BASE_LOADERS
+    return Engine(
+        dirs=configured.dirs,
+        loaders=loaders,
+        libraries=configured.libraries,
+        builtins=configured.builtins,
+        autoescape=configured.autoescape,
+    )
+
+
+class Command(BaseCommand):
+    help = "对比仪表盘页面在不同模板缓存方式下的渲染耗时"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', default='seed_0000', help="使用该用户的数据渲染（先用 seed_data 生成）")
+        parser.add_argument('--iterations', type=int, default=200, help="每个页面每种方式的渲染次数")
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options['user']).first()
+        if user is None:
+            raise CommandError(f"用户不存在: {options['user']}，请先运行 seed_data")
+
+        contexts = self.page_contexts(user)
+        parse_engine, cached_engine = _engine(cached=False), _engine(cached=True)
+
+        def parse(name, context):
+            self.clear_fragments(context['page'])
+            return parse_engine.get_template(name).render(context)
+
+        def cached(name, context):
+            self.clear_fragments(context['page'])
+            return cached_engine.get_template(name).render(context)
+
+        def fragments(name, context):
+            return cached_engine.get_template(name).render(context)
+
+        modes = {'parse': parse, 'cached': cached, 'fragments': fragments}
+        self.stdout.write(f"{'页面':12}" + ''.join(f"{mode:>22}" for mode in modes))
+        for page, context in contexts.items():
+            name = PAGES[page]
+            row = []
+            for render in modes.values():
+                render(name, context)  # 预热
+                row.append(self.measure(render, name, context, options['iterations']))
+            self.stdout.write(f"{page:12}" + ''.join(
+                f"{f'{mean:.3f} / p95 {p95:.3f} ms':>22}" for mean, p95 in row
+            ))
+        for page in PAGES:
+            self.clear_fragments(page)
+
+    def page_contexts(self, user):
+        """请求每个页面一次，记录视图传给页面模板的上下文"""
+        client = Client()
+        client.force_login(user)
+        contexts = {}
+        with _capture_context():
+            for page, name in PAGES.items():
+                response = client.get(reverse(page))
+                if response.status_code != 200:
+                    # 例如今天已打卡时，打卡页面会重定向到仪表盘
+                    self.stderr.write(f"跳过 {page}：响应状态 {response.status_code}")
+                    continue
+                rendered = next(
+                    (context for template, context in zip(response.templates, response.context)
+                     if template.name == name),
+                    None,
+                )
+                if rendered is None:
+                    raise CommandError(f"{page} 页面没有使用模板 {name}")
+                contexts[page] = Context(rendered.flatten())
+        return contexts
+
+    def clear_fragments(self, page):
+        cache.delete_many([make_template_fragment_key(fragment, [page]) for fragment in FRAGMENTS])
+
+    def measure(self, render, name, context, iterations):
+        samples = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            render(name, context)
+            samples.append(time.perf_counter() - start)
+        samples.sort()
+        return sum(samples) / len(samples) * 1000, percentile(samples, 95) * 1000
@@ -0,0 +1,179 @@
+"""对 dashboard 和 accounts 的全部 URL 逐个压测，输出 JSON 结果用于前后对比
+
+用法：
+    python manage.py seed_data --users 10
+    python manage.py bench_urls --user seed_0000 --output before.json
+    python manage.py bench_urls --user seed_0000 --output after.json --compare before.json
+
+默认在进程内用测试客户端串行请求；指定 --base-url 时对已启动的服务器并发请求。
+每个 URL 统计每秒请求数、p50/p95/p99 延迟和平均 SQL 次数（读取 PerformanceMiddleware
+的 Server-Timing 头，PERF_SAMPLE_RATE 需为 1）。会修改或删除数据的 URL 被跳过，
+只接受 POST 的 URL 在预热时返回 405，同样跳过。
+"""
+import json
+import platform
+
+import django
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.urls import urlpatterns as accounts_patterns
+from dashboard.benchmark import run_client, run_load, server_timing_queries, session_cookie
+from dashboard.models import Music, MusicUpload
+from dashboard.urls import urlpatterns as dashboard_patterns
+
+# 请求本身会修改数据或登录状态的 URL
+SKIP = {
+    'logout': "会退出登录",
+    'delete_music': "会删除数据",
+    'set_default_location': "会修改数据",
+}
+# 必须带查询参数才能正常响应的 URL
+QUERY = {
+    'location_nearby_api': '?lat=39.9042&lng=116.4074&n=10',
+    'music_search_api': '?q=%E6%AD%8C%E6%9B%B2',
+    'music_suggest_api': '?q=%E6%AD%8C%E6%9B%B2',
+}
+
+
+class Command(BaseCommand):
+    help = "逐个压测 dashboard 和 accounts 的 URL，输出 rps、延迟分位数和每请求 SQL 次数"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', default='seed_0000', help="压测使用的用户（先用 seed_data 生成）")
+        parser.add_argument('--iterations', type=int, default=50, help="每个 URL 的请求数")
+        parser.add_argument('--warmup', type=int, default=3, help="每个 URL 的预热请求数")
+        parser.add_argument('--base-url', help="对已启动的服务器压测，例如 http://127.0.0.1:8000")
+        parser.add_argument('--concurrency', type=int, default=8, help="--base-url 模式下的并发连接数")
+        parser.add_argument('--output', help="结果写入的 JSON 文件，默认输出到标准输出")
+        parser.add_argument('--compare', help="与之前的结果文件对比")
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options['user']).first()
+        if user is None:
+            raise CommandError(f"用户不存在: {options['user']}，请先运行 seed_data")
+
+        targets, skipped = self.targets(user)
+        if options['base_url']:
+            measure = self.server_measure(user, options)
+        else:
+            measure = self.client_measure(user, options)
+
+        results = {}
+        for name, path in targets.items():
+            result = measure(path)
+            if result is None:
+                skipped[name] = "只接受 POST"
+                continue
+            results[name] = dict(path=path, **result)
+            self.stderr.write(
+                f"{name:24} {result['rps']:>8} req/s  p99 {result['p99_ms']} ms  SQL {result['queries']}"
+            )
+
+        report = {
+            'meta': {
+                'mode': 'server' if options['base_url'] else 'client',
+                'base_url': options['base_url'],
+                'user': user.username,
+                'iterations': options['iterations'],
+                'concurrency': options['concurrency'] if options['base_url'] else 1,
+                'database': connection.vendor,
+                'django': django.get_version(),
+                'python': platform.python_version(),
+                'timestamp': timezone.now().isoformat(),
+            },
+            'results': results,
+            'skipped': skipped,
+        }
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(output)
+        else:
+            self.stdout.write(output)
+
+        if options['compare']:
+            self.compare(options['compare'], results)
+
+    def targets(self, user):
+        """{URL 名称: 路径}，带参数的 URL 使用该用户的一条已有记录"""
+        samples = {
+            'music_id': Music.objects.filter(user=user).values_list('id', flat=True).first(),
+            'upload_id': MusicUpload.objects.filter(user=user).values_list('id', flat=True).first(),
+        }
+        targets, skipped = {}, {}
+        for pattern in [*dashboard_patterns, *accounts_patterns]:
+            name = pattern.name
+            if name in SKIP:
+                skipped[name] = SKIP[name]
+                continue
+            params = list(pattern.pattern.converters)
+            missing = [param for param in params if samples.get(param) is None]
+            if missing:
+                skipped[name] = f"没有可用的 {', '.join(missing)}"
+                continue
+            targets[name] = reverse(name, kwargs={param: samples[param] for param in params}) + QUERY.get(name, '')
+        return targets, skipped
+
+    def client_measure(self, user, options):
+        client = Client()
+        client.force_login(user)
+
+        def measure(path):
+            for _ in range(options['warmup']):
+                if client.get(path).status_code == 405:
+                    return None
+            return run_client(client, path, options['iterations'])
+
+        return measure
+
+    def server_measure(self, user, options):
+        headers = {'Cookie': session_cookie(user)}
+
+        def measure(path):
+            statuses, queries = [], []
+
+            def on_response(_path, response):
+                statuses.append(response.status)
+                count = server_timing_queries(response.getheader('Server-Timing'))
+                if count is not None:
+                    queries.append(count)
+
+            run_load(options['base_url'], [path], options['warmup'], 1, headers, on_response)
+            if 405 in statuses:
+                return None
+            statuses.clear()
+            queries.clear()
+            result = run_load(
+                options['base_url'], [path], options['iterations'], options['concurrency'], headers, on_response
+            )
+            result['status'] = statuses[-1] if statuses else None
+            result['queries'] = round(sum(queries) / len(queries), 1) if queries else None
+            return result
+
+        return measure
+
+    def compare(self, path, results):
+        """输出与之前结果相比的 rps、p99 和 SQL 次数变化"""
+        with open(path, encoding='utf-8') as f:
+            previous = json.load(f)['results']
+
+        def change(old, new):
+            if not old or new is None:
+                return '-'
+            return f'{(new - old) / old * 100:+.1f}%'
+
+        self.stderr.write(f"\n与 {path} 对比：")
+        for name, result in results.items():
+            old = previous.get(name)
+            if old is None:
+                continue
+            self.stderr.write(
+                f"{name:24} rps {change(old['rps'], result['rps']):>8}  "
+                f"p99 {change(old['p99_ms'], result['p99_ms']):>8}  "
+                f"SQL {old['queries']} -> {result['queries']}"
+            )
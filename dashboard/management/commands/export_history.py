@@ -0,0 +1,34 @@
+"""流式导出用户足迹
+
+用法：python manage.py export_history <用户名> [--format csv|ndjson|geojson] [--kind all] [--output 文件]
+未指定 --output 时写到标准输出。
+"""
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.exporter import CHUNK_SIZE, FORMATS, KINDS, export_lines
+
+
+class Command(BaseCommand):
+    help = "流式导出用户的活动和打卡记录"
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help="导出的用户")
+        parser.add_argument('--format', choices=FORMATS, default='csv', help="导出格式")
+        parser.add_argument('--kind', choices=KINDS, default='all', help="记录类型")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="每批读取条数")
+        parser.add_argument('--output', help="输出文件路径，默认标准输出")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"用户不存在: {options['username']}")
+
+        lines = export_lines(user, options['format'], options['kind'], options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as f:
+                f.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
@@ -0,0 +1,60 @@
+"""为已有的音频文件解析时长、比特率、采样率、内嵌封面和波形峰值
+
+用法：python manage.py extract_audio_metadata [--workers 4] [--force]
+
+默认只处理尚未解析过的 AudioBlob，--force 重新解析全部。
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from dashboard.audio import extract_blob_metadata
+from dashboard.models import AudioBlob
+
+
+def _init_worker():
+    # spawn 方式启动的子进程需要重新加载 Django 配置
+    django.setup()
+
+
+def _extract(blob_id):
+    # 子进程中执行；异常以字符串返回，避免单个坏文件中断整个批次
+    try:
+        info = extract_blob_metadata(blob_id)
+        return blob_id, info is not None, None
+    except Exception as e:
+        return blob_id, False, str(e)
+
+
+class Command(BaseCommand):
+    help = "为已有的音频文件解析元数据和波形峰值"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help="进程数，默认为CPU核数")
+        parser.add_argument('--force', action='store_true', help="忽略已有结果，全部重新解析")
+
+    def handle(self, *args, **options):
+        blobs = AudioBlob.objects.order_by('pk')
+        if not options['force']:
+            blobs = blobs.filter(metadata_at__isnull=True)
+        blob_ids = list(blobs.values_list('pk', flat=True))
+        self.stdout.write(f"共 {len(blob_ids)} 个音频文件")
+        # fork 出的子进程不能共用父进程的数据库连接
+        connections.close_all()
+
+        parsed = unknown = failed = 0
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker) as pool:
+            futures = [pool.submit(_extract, blob_id) for blob_id in blob_ids]
+            for future in as_completed(futures):
+                blob_id, recognized, error = future.result()
+                if error:
+                    failed += 1
+                    self.stderr.write(f"AudioBlob {blob_id}: {error}")
+                elif recognized:
+                    parsed += 1
+                else:
+                    unknown += 1
+
+        self.stdout.write(self.style.SUCCESS(f"解析 {parsed} 个，无法识别格式 {unknown} 个，失败 {failed} 个"))
@@ -0,0 +1,84 @@
+"""回收 MEDIA_ROOT 中不再被任何记录引用的文件
+
+用法：python manage.py gc_media [--grace-hours 24] [--dry-run]
+
+先把数据库中引用的文件名读入集合，再流式扫描受管目录，修改时间早于宽限期且未被引用的文件
+视为孤立文件。删除前按批再查询一次数据库，扫描期间新增引用的文件（如重新上传了相同内容的音频）不会被删除。
+"""
+import time
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from dashboard.media_files import (
+    MANAGED_DIRS, RECHECK_BATCH, is_referenced, iter_media_files, referenced_names, still_referenced,
+)
+
+
+def _format_size(size):
+    if size < 1024:
+        return f"{size} B"
+    for unit in ('KB', 'MB', 'GB'):
+        size /= 1024
+        if size < 1024 or unit == 'GB':
+            return f"{size:.1f} {unit}"
+
+
+class Command(BaseCommand):
+    help = "回收 MEDIA_ROOT 中不再被引用的音乐、封面和头像文件"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=float, default=24,
+                            help="只回收修改时间早于该小时数的文件，默认 24")
+        parser.add_argument('--dry-run', action='store_true', help="只统计可回收的文件，不删除")
+
+    def handle(self, *args, **options):
+        names = referenced_names()
+        self.stdout.write(f"数据库引用 {len(names)} 个文件，扫描目录：{', '.join(MANAGED_DIRS)}")
+        cutoff = time.time() - options['grace_hours'] * 3600
+        dry_run = options['dry_run']
+
+        stats = {'scanned': 0, 'scanned_bytes': 0, 'orphans': 0, 'orphan_bytes': 0, 'deleted': 0, 'deleted_bytes': 0}
+        batch = []
+
+        def flush():
+            referenced = still_referenced(name for name, _ in batch)
+            for name, size in batch:
+                if name in referenced:
+                    continue
+                stats['orphans'] += 1
+                stats['orphan_bytes'] += size
+                if dry_run:
+                    if options['verbosity'] > 1:
+                        self.stdout.write(f"  {name} ({_format_size(size)})")
+                    continue
+                try:
+                    default_storage.delete(name)
+                except OSError as e:
+                    self.stderr.write(f"{name}: {e}")
+                    continue
+                stats['deleted'] += 1
+                stats['deleted_bytes'] += size
+            batch.clear()
+
+        for name, size, mtime in iter_media_files():
+            stats['scanned'] += 1
+            stats['scanned_bytes'] += size
+            if mtime >= cutoff or is_referenced(name, names):
+                continue
+            batch.append((name, size))
+            if len(batch) >= RECHECK_BATCH:
+                flush()
+        if batch:
+            flush()
+
+        self.stdout.write(
+            f"扫描 {stats['scanned']} 个文件（{_format_size(stats['scanned_bytes'])}），"
+            f"孤立文件 {stats['orphans']} 个，可回收 {_format_size(stats['orphan_bytes'])}"
+        )
+        if dry_run:
+            self.stdout.write("--dry-run：未删除任何文件")
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"已删除 {stats['deleted']} 个文件，释放 {_format_size(stats['deleted_bytes'])}"
+            ))
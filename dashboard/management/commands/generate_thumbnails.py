@@ -0,0 +1,58 @@
+"""为已有的音乐封面和用户头像批量生成缩略图
+
+用法：python manage.py generate_thumbnails [--workers 4] [--force]
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.management.base import BaseCommand
+
+from accounts.models import UserProfile
+from dashboard.models import Music
+from dashboard.thumbnails import generate_variants, is_variant
+
+
+def _init_worker():
+    # spawn 方式启动的子进程需要重新加载 Django 配置
+    django.setup()
+
+
+def _generate(name, force):
+    # 子进程中执行；异常以字符串返回，避免单张坏图中断整个批次
+    try:
+        return name, generate_variants(name, force=force), None
+    except Exception as e:
+        return name, 0, str(e)
+
+
+class Command(BaseCommand):
+    help = "为音乐封面和用户头像批量生成缩略图"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help="进程数，默认为CPU核数")
+        parser.add_argument('--force', action='store_true', help="忽略已有缩略图，全部重新生成")
+
+    def handle(self, *args, **options):
+        names = set(
+            Music.objects.exclude(cover_image='').exclude(cover_image__isnull=True)
+            .values_list('cover_image', flat=True)
+        )
+        names.update(
+            UserProfile.objects.exclude(avatar='').exclude(avatar__isnull=True)
+            .values_list('avatar', flat=True)
+        )
+        names = sorted(name for name in names if not is_variant(name))
+        self.stdout.write(f"共 {len(names)} 张原图")
+
+        generated = failed = 0
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker) as pool:
+            futures = [pool.submit(_generate, name, options['force']) for name in names]
+            for future in as_completed(futures):
+                name, count, error = future.result()
+                if error:
+                    failed += 1
+                    self.stderr.write(f"{name}: {error}")
+                else:
+                    generated += count
+
+        self.stdout.write(self.style.SUCCESS(f"生成 {generated} 个缩略图，失败 {failed} 张"))
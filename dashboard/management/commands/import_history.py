@@ -0,0 +1,47 @@
+"""从 CSV / NDJSON 批量导入活动或打卡记录
+
+用法：python manage.py import_history <用户名> <activity|checkin> <文件> [--format csv] [--report errors.csv]
+
+CSV 首行为列名。活动列：title, category, description, location_id, start_time, end_time, created_at；
+打卡列：created_at, status, notes, location_id。时间使用 ISO 8601，无时区时按 TIME_ZONE 处理。
+"""
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.importer import BATCH_SIZE, KINDS, guess_format, import_records, iter_rows
+
+
+class Command(BaseCommand):
+    help = "从 CSV / NDJSON 批量导入活动或打卡记录"
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help="导入到的用户")
+        parser.add_argument('kind', choices=KINDS, help="记录类型")
+        parser.add_argument('path', help="CSV 或 NDJSON 文件路径")
+        parser.add_argument('--format', choices=('csv', 'ndjson'), help="文件格式，默认按扩展名判断")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="每批写入条数")
+        parser.add_argument('--report', help="被拒绝行的错误报告输出路径（CSV）")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"用户不存在: {options['username']}")
+
+        fmt = options['format'] or guess_format(options['path'])
+        try:
+            with open(options['path'], 'rb') as f:
+                result = import_records(user, options['kind'], iter_rows(f, fmt), options['batch_size'])
+        except OSError as e:
+            raise CommandError(f"无法读取文件: {e}")
+
+        if options['report'] and result.rejected:
+            with open(options['report'], 'w', newline='', encoding='utf-8') as f:
+                result.write_report(f)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"成功导入 {result.created} 条，拒绝 {len(result.rejected)} 条"
+        ))
+        if result.rejected and not options['report']:
+            for line_no, error in result.rejected[:20]:
+                self.stderr.write(f"第 {line_no} 行: {error}")
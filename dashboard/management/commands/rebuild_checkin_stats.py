@@ -0,0 +1,36 @@
+"""从原始打卡记录重建打卡统计（连续天数、月度统计）
+
+用法：python manage.py rebuild_checkin_stats [--user 用户名] [--batch-size 500]
+"""
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.stats import rebuild_stats
+
+
+class Command(BaseCommand):
+    help = "从原始打卡记录批量重建打卡统计"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="只重建指定用户")
+        parser.add_argument('--batch-size', type=int, default=500, help="每批处理的用户数")
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('id')
+        if options['user']:
+            users = users.filter(username=options['user'])
+            if not users.exists():
+                raise CommandError(f"用户不存在: {options['user']}")
+
+        total = 0
+        last_id = 0
+        while True:
+            user_ids = list(users.filter(id__gt=last_id).values_list('id', flat=True)[:options['batch_size']])
+            if not user_ids:
+                break
+            total += rebuild_stats(user_ids)
+            last_id = user_ids[-1]
+            if options['verbosity'] > 1:
+                self.stdout.write(f"已处理 {total} 个用户")
+
+        self.stdout.write(self.style.SUCCESS(f"已重建 {total} 个用户的打卡统计"))
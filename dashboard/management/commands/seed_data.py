@@ -0,0 +1,200 @@
+"""生成压测用的模拟数据（用户、地址、打卡、活动、音乐）
+
+用法：python manage.py seed_data [--users 10] [--scale 1.0] [--seed 42] [--flush]
+
+相同的 --seed、--anchor 与用户序号生成的数据完全相同；增加 --users 不会改变已有用户的数据。
+scale=1 时每个用户约有 20 个地址、一年的打卡记录、400 条活动和 30 首音乐。
+所有音乐共用一个内置的静音 WAV 文件（按内容去重存储）。
+"""
+import hashlib
+import io
+import random
+import wave
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from accounts.models import UserProfile
+from dashboard.cache import bump_user_version
+from dashboard.heatmap import bump_history_version
+from dashboard.search import bump_search_version
+from dashboard.models import Activity, AudioBlob, CheckIn, Location, Music
+from dashboard.stats import rebuild_stats
+from dashboard.uploads import acquire_blob
+
+BATCH_SIZE = 1000
+CITIES = [
+    ('北京', 39.9042, 116.4074),
+    ('上海', 31.2304, 121.4737),
+    ('广州', 23.1291, 113.2644),
+    ('成都', 30.5728, 104.0668),
+    ('杭州', 30.2741, 120.1551),
+]
+PLACES = ['家', '公司', '健身房', '图书馆', '咖啡馆', '公园', '学校', '超市']
+STATUS_WEIGHTS = [('completed', 80), ('late', 15), ('absent', 5)]
+ARTISTS = ['周杰伦', '陈奕迅', '王菲', '林俊杰', '孙燕姿', '五月天']
+
+LOCATIONS_PER_USER = 20
+CHECKIN_DAYS = 365
+ACTIVITIES_PER_USER = 400
+MUSIC_PER_USER = 30
+
+
+def _scaled(count, scale):
+    return max(int(count * scale), 1)
+
+
+def _silent_wav(seconds=1, rate=8000):
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(b'\0\0' * rate * seconds)
+    return buffer.getvalue()
+
+
+def _aware(day, hour, minute=0):
+    return timezone.make_aware(datetime.combine(day, time(hour, minute)))
+
+
+class Command(BaseCommand):
+    help = "批量生成压测用的模拟用户和数据"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10, help="用户数")
+        parser.add_argument('--scale', type=float, default=1.0, help="每个用户数据量的倍数")
+        parser.add_argument('--seed', type=int, default=42, help="随机种子")
+        parser.add_argument('--prefix', default='seed', help="用户名前缀，生成 <前缀>_0000 等")
+        parser.add_argument('--password', default='seed-pass-123', help="所有模拟用户的密码")
+        parser.add_argument('--anchor', help="数据截止日期 YYYY-MM-DD，默认今天")
+        parser.add_argument('--flush', action='store_true', help="先删除该前缀的已有用户")
+
+    def handle(self, *args, **options):
+        prefix, scale = options['prefix'], options['scale']
+        if scale <= 0:
+            raise CommandError("--scale 必须大于0")
+        anchor = (datetime.strptime(options['anchor'], '%Y-%m-%d').date()
+                  if options['anchor'] else timezone.localdate())
+
+        existing = User.objects.filter(username__startswith=f'{prefix}_')
+        if existing.exists():
+            if not options['flush']:
+                raise CommandError(f"已存在前缀为 {prefix}_ 的用户，使用 --flush 先删除")
+            deleted, _ = existing.delete()
+            self.stdout.write(f"已删除 {deleted} 条旧数据")
+
+        usernames = [f'{prefix}_{index:04d}' for index in range(options['users'])]
+        # 密码哈希很慢，所有模拟用户共用一个
+        password = make_password(options['password'])
+        with transaction.atomic():
+            User.objects.bulk_create(
+                [User(username=name, email=f'{name}@example.com', password=password) for name in usernames],
+                batch_size=BATCH_SIZE,
+            )
+            # MySQL 的 bulk_create 不返回主键，重新查询
+            users = list(User.objects.filter(username__in=usernames).order_by('username'))
+            UserProfile.objects.bulk_create([UserProfile(user=user) for user in users], batch_size=BATCH_SIZE)
+
+            audio = _silent_wav()
+            blob = acquire_blob(
+                hashlib.sha256(audio).hexdigest(), len(audio), 'seed.wav', lambda: io.BytesIO(audio)
+            )
+
+            totals = dict.fromkeys(['locations', 'checkins', 'activities', 'music'], 0)
+            for index, user in enumerate(users):
+                rng = random.Random(f"{options['seed']}:{index}")
+                for key, count in self.seed_user(user, rng, scale, anchor, blob).items():
+                    totals[key] += count
+
+            # acquire_blob 已计入一次引用
+            AudioBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + totals['music'] - 1)
+
+        user_ids = [user.pk for user in users]
+        rebuild_stats(user_ids)
+        for user_id in user_ids:
+            bump_user_version(user_id)
+            bump_history_version(user_id)
+            bump_search_version(user_id)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"已生成 {len(users)} 个用户：地址 {totals['locations']}，打卡 {totals['checkins']}，"
+            f"活动 {totals['activities']}，音乐 {totals['music']}"
+        ))
+
+    def seed_user(self, user, rng, scale, anchor, blob):
+        """生成一个用户的全部数据，返回各类记录数"""
+        start = anchor - timedelta(days=CHECKIN_DAYS - 1)
+
+        locations = []
+        for i in range(_scaled(LOCATIONS_PER_USER, scale)):
+            city, lat, lng = rng.choice(CITIES)
+            location = Location(
+                user=user,
+                name=f'{city}{rng.choice(PLACES)}{i + 1}',
+                address=f'{city}市某区某路{rng.randint(1, 999)}号',
+                latitude=round(lat + rng.uniform(-0.2, 0.2), 6),
+                longitude=round(lng + rng.uniform(-0.2, 0.2), 6),
+                is_default=(i == 0),
+                created_at=_aware(start + timedelta(days=rng.randrange(CHECKIN_DAYS)), rng.randint(8, 22)),
+            )
+            # bulk_create 不调用 save()，需要手动计算 geohash
+            location.update_geohash()
+            locations.append(location)
+        Location.objects.bulk_create(locations, batch_size=BATCH_SIZE)
+        location_ids = list(Location.objects.filter(user=user).values_list('id', flat=True))
+
+        checkins = []
+        statuses, weights = zip(*STATUS_WEIGHTS)
+        for offset in range(_scaled(CHECKIN_DAYS, scale)):
+            day = anchor - timedelta(days=offset)
+            if rng.random() > 0.85:
+                continue
+            checkins.append(CheckIn(
+                user=user,
+                location_id=rng.choice(location_ids),
+                status=rng.choices(statuses, weights)[0],
+                created_at=_aware(day, rng.randint(7, 10), rng.randint(0, 59)),
+                checkin_date=day,
+            ))
+        CheckIn.objects.bulk_create(checkins, batch_size=BATCH_SIZE)
+
+        categories = [category for category, _ in Activity.CATEGORY_CHOICES]
+        activities = []
+        for i in range(_scaled(ACTIVITIES_PER_USER, scale)):
+            begin = _aware(start + timedelta(days=rng.randrange(CHECKIN_DAYS)), rng.randint(6, 21), rng.randint(0, 59))
+            activities.append(Activity(
+                user=user,
+                title=f'活动{i + 1}',
+                category=rng.choice(categories),
+                description=rng.choice([None, '模拟数据']),
+                location_id=rng.choice(location_ids + [None]),
+                start_time=begin,
+                end_time=begin + timedelta(minutes=rng.randint(15, 180)),
+            ))
+        Activity.objects.bulk_create(activities, batch_size=BATCH_SIZE)
+
+        music = [
+            Music(
+                user=user,
+                title=f'歌曲{i + 1}',
+                artist=rng.choice(ARTISTS),
+                audio_file=blob.file.name,
+                blob=blob,
+                uploaded_at=_aware(start + timedelta(days=rng.randrange(CHECKIN_DAYS)), rng.randint(0, 23)),
+            )
+            for i in range(_scaled(MUSIC_PER_USER, scale))
+        ]
+        Music.objects.bulk_create(music, batch_size=BATCH_SIZE)
+
+        return {
+            'locations': len(locations),
+            'checkins': len(checkins),
+            'activities': len(activities),
+            'music': len(music),
+        }
@@ -0,0 +1,125 @@
+"""媒体文件的延迟删除与孤立文件回收
+
+删除记录或替换头像后，原文件在事务提交后删除（连同缩略图），事务回滚时文件保留。
+删除前再查询一次数据库，仍被其他记录引用的文件不删除：去重后的音频和内嵌封面由多条记录共用。
+
+此前遗留的文件用 python manage.py gc_media 回收：流式扫描 MEDIA_ROOT 下的受管目录，
+与数据库中所有文件字段的值（每个字段一条查询，读入集合）比较，超过宽限期仍未被引用的文件即为孤立文件。
+宽限期保护刚写入存储、记录还没提交的文件。
+"""
+import logging
+import os
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import models, transaction
+
+from .thumbnails import FORMATS, THUMBNAIL_SIZES, is_variant, original_name, variant_name
+
+logger = logging.getLogger(__name__)
+
+# 由模型文件字段和分块上传使用的目录（相对于 MEDIA_ROOT），只在这些目录中回收
+MANAGED_DIRS = tuple(getattr(settings, 'MEDIA_GC_DIRS', ('music', 'music_covers', 'avatars', 'uploads')))
+# 再次确认引用时每批查询的文件数
+RECHECK_BATCH = 500
+
+
+def _file_fields():
+    """所有模型的文件字段：(模型, 字段名)"""
+    for model in apps.get_models():
+        for field in model._meta.concrete_fields:
+            if isinstance(field, models.FileField):
+                yield model, field.attname
+
+
+def _relative(path):
+    return os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, '/')
+
+
+def referenced_names():
+    """数据库中引用的存储名集合"""
+    from .models import MusicUpload
+    from .uploads import part_path
+
+    names = set()
+    for model, field in _file_fields():
+        names.update(
+            model._default_manager.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+            .values_list(field, flat=True).iterator(chunk_size=5000)
+        )
+    # 进行中的分块上传的临时文件
+    for upload in MusicUpload.objects.only('pk').iterator(chunk_size=5000):
+        names.add(_relative(part_path(upload)))
+    return names
+
+
+def is_referenced(name, names):
+    if name in names:
+        return True
+    # 缩略图 foo.jpg.256.webp 随原图 foo.jpg 保留
+    return is_variant(name) and original_name(name) in names
+
+
+def still_referenced(names):
+    """再次查询数据库，返回 names 中此刻仍被引用的文件名"""
+    names = list(names)
+    found = set()
+    for model, field in _file_fields():
+        found.update(model._default_manager.filter(**{f'{field}__in': names}).values_list(field, flat=True))
+    return found
+
+
+def iter_media_files(dirs=MANAGED_DIRS):
+    """流式遍历受管目录，产生 (存储名, 字节数, 修改时间)"""
+    stack = [os.path.join(settings.MEDIA_ROOT, d) for d in dirs]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    stat = entry.stat(follow_symlinks=False)
+                    yield _relative(entry.path), stat.st_size, stat.st_mtime
+
+
+def delete_unreferenced(names):
+    """删除 names 中不再被任何记录引用的文件及其缩略图，返回删除的文件数"""
+    names = [name for name in names if name]
+    if not names:
+        return 0
+    referenced = still_referenced(names)
+    deleted = 0
+    for name in names:
+        if name in referenced:
+            continue
+        try:
+            default_storage.delete(name)
+            if not is_variant(name):
+                for size in THUMBNAIL_SIZES:
+                    for ext, _ in FORMATS:
+                        default_storage.delete(variant_name(name, size, ext))
+        except OSError:
+            logger.exception("删除文件失败: %s", name)
+            continue
+        deleted += 1
+    return deleted
+
+
+def delete_files_on_commit(*names):
+    """事务提交后删除文件（仍被引用的保留），事务回滚时不删除"""
+    names = {name for name in names if name}
+    if names:
+        transaction.on_commit(lambda: delete_unreferenced(names))
+
+
+def delete_field_files_on_commit(instance):
+    """记录删除后调用：事务提交后删除其所有文件字段引用的文件"""
+    delete_files_on_commit(*(
+        getattr(instance, field.attname).name
+        for field in instance._meta.concrete_fields if isinstance(field, models.FileField)
+    ))
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:35
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_checkin_date(apps, schema_editor):
+    """按本地时区回填打卡日期，同一用户同一天的重复记录只保留最早一条的日期"""
+    CheckIn = apps.get_model('dashboard', 'CheckIn')
+    seen = set()
+    batch = []
+    for checkin in CheckIn.objects.order_by('created_at', 'id').only('id', 'user_id', 'created_at').iterator(chunk_size=2000):
+        key = (checkin.user_id, timezone.localdate(checkin.created_at))
+        if key in seen:
+            continue
+        seen.add(key)
+        checkin.checkin_date = key[1]
+        batch.append(checkin)
+        if len(batch) >= 2000:
+            CheckIn.objects.bulk_update(batch, ['checkin_date'])
+            batch = []
+    if batch:
+        CheckIn.objects.bulk_update(batch, ['checkin_date'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0003_dashboard_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='checkin',
+            name='checkin_date',
+            field=models.DateField(blank=True, editable=False, null=True, verbose_name='打卡日期'),
+        ),
+        migrations.RunPython(fill_checkin_date, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='checkin',
+            constraint=models.UniqueConstraint(fields=('user', 'checkin_date'), name='checkin_unique_user_date'),
+        ),
+    ]
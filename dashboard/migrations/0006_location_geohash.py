@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+from dashboard.geo import encode
+
+
+def fill_geohash(apps, schema_editor):
+    """为已有坐标的地址回填 geohash"""
+    Location = apps.get_model('dashboard', 'Location')
+    batch = []
+    queryset = Location.objects.filter(latitude__isnull=False, longitude__isnull=False).only('id', 'latitude', 'longitude')
+    for location in queryset.iterator(chunk_size=2000):
+        location.geohash = encode(float(location.latitude), float(location.longitude))
+        batch.append(location)
+        if len(batch) >= 2000:
+            Location.objects.bulk_update(batch, ['geohash'])
+            batch = []
+    if batch:
+        Location.objects.bulk_update(batch, ['geohash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0005_chunked_uploads'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='geohash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=12, verbose_name='Geohash'),
+        ),
+        migrations.RunPython(fill_geohash, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='location',
+            index=models.Index(fields=['user', 'geohash'], name='location_user_geohash_idx'),
+        ),
+    ]
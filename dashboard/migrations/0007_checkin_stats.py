@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0006_location_geohash'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CheckInStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_count', models.PositiveIntegerField(default=0, verbose_name='打卡总次数')),
+                ('current_streak', models.PositiveIntegerField(default=0, verbose_name='当前连续天数')),
+                ('longest_streak', models.PositiveIntegerField(default=0, verbose_name='最长连续天数')),
+                ('last_checkin_date', models.DateField(blank=True, null=True, verbose_name='最近打卡日期')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='checkin_stats', to=settings.AUTH_USER_MODEL, verbose_name='用户')),
+            ],
+            options={
+                'verbose_name': '打卡统计',
+                'verbose_name_plural': '打卡统计',
+            },
+        ),
+        migrations.CreateModel(
+            name='CheckInMonthlyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='月份')),
+                ('completed', models.PositiveIntegerField(default=0, verbose_name='已完成')),
+                ('late', models.PositiveIntegerField(default=0, verbose_name='迟到')),
+                ('absent', models.PositiveIntegerField(default=0, verbose_name='缺席')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkin_monthly_stats', to=settings.AUTH_USER_MODEL, verbose_name='用户')),
+            ],
+            options={
+                'verbose_name': '月度打卡统计',
+                'verbose_name_plural': '月度打卡统计',
+                'ordering': ['-month'],
+                'constraints': [models.UniqueConstraint(fields=('user', 'month'), name='checkin_monthly_unique_user_month')],
+            },
+        ),
+    ]
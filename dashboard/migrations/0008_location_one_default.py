@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def keep_latest_default(apps, schema_editor):
+    """并发保存可能留下多个默认地址，每个用户只保留最近更新的一个"""
+    Location = apps.get_model('dashboard', 'Location')
+    duplicated = (
+        Location.objects.filter(is_default=True).values('user_id')
+        .annotate(count=models.Count('id')).filter(count__gt=1).values_list('user_id', flat=True)
+    )
+    for user_id in list(duplicated):
+        keep = Location.objects.filter(user_id=user_id, is_default=True).order_by('-updated_at', '-id').first()
+        Location.objects.filter(user_id=user_id, is_default=True).exclude(pk=keep.pk).update(is_default=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0007_checkin_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(keep_latest_default, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='location',
+            name='default_owner',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(is_default=True, then=models.F('user')), default=None), output_field=models.IntegerField(null=True), verbose_name='默认地址所属用户'),
+        ),
+        migrations.AddConstraint(
+            model_name='location',
+            constraint=models.UniqueConstraint(fields=('default_owner',), name='location_one_default_per_user'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def create_fulltext_index(apps, schema_editor):
+    """MySQL 上为标题和艺术家创建 ngram 分词的全文索引（其他数据库使用进程内索引，见 search.py）"""
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute(
+            'CREATE FULLTEXT INDEX music_title_artist_ft ON dashboard_music (title, artist) WITH PARSER ngram'
+        )
+
+
+def drop_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute('DROP INDEX music_title_artist_ft ON dashboard_music')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0008_location_one_default'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='music',
+            index=models.Index(fields=['user', 'title'], name='music_user_title_idx'),
+        ),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0009_music_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='audioblob',
+            name='bitrate',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='比特率'),
+        ),
+        migrations.AddField(
+            model_name='audioblob',
+            name='channels',
+            field=models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='声道数'),
+        ),
+        migrations.AddField(
+            model_name='audioblob',
+            name='cover_image',
+            field=models.ImageField(blank=True, upload_to='music_covers/embedded/', verbose_name='内嵌封面'),
+        ),
+        migrations.AddField(
+            model_name='audioblob',
+            name='duration',
+            field=models.FloatField(blank=True, null=True, verbose_name='时长（秒）'),
+        ),
+        migrations.AddField(
+            model_name='audioblob',
+            name='format',
+            field=models.CharField(blank=True, max_length=10, verbose_name='格式'),
+        ),
+        migrations.AddField(
+            model_name='audioblob',
+            name='metadata_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='元数据解析时间'),
+        ),
+        migrations.AddField(
+            model_name='audioblob',
+            name='peaks',
+            field=models.BinaryField(blank=True, null=True, verbose_name='波形峰值'),
+        ),
+        migrations.AddField(
+            model_name='audioblob',
+            name='sample_rate',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='采样率'),
+        ),
+    ]
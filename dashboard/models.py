@@ -1,8 +1,19 @@
-from django.db import models
+import random
+import time
+import uuid
+
+from django.conf import settings
+from django.db import connections, models, router, transaction, IntegrityError, OperationalError
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.core.exceptions import ValidationError
-from datetime import date
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .cache import bump_user_version
+
+# 切换默认地址遇到死锁或锁等待超时时的重试次数
+LOCK_RETRIES = getattr(settings, 'LOCATION_LOCK_RETRIES', 8)
 
 
 class Location(models.Model):
@@ -13,13 +24,31 @@ class Location(models.Model):
     latitude = models.DecimalField(max_digits=10, decimal_places=6, null=True, blank=True, verbose_name="纬度")
     longitude = models.DecimalField(max_digits=10, decimal_places=6, null=True, blank=True, verbose_name="经度")
     is_default = models.BooleanField(default=False, verbose_name="是否默认地址")
+    # 由经纬度计算，用于空间查询（见 geo.py）；无坐标时为空字符串
+    geohash = models.CharField(max_length=12, blank=True, default='', editable=False, verbose_name="Geohash")
     created_at = models.DateTimeField(default=timezone.now, verbose_name="创建时间")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="更新时间")
+    # 默认地址为所属用户 id，否则为 NULL；其上的唯一约束保证每个用户最多一个默认地址
+    # （MySQL 不支持带条件的唯一索引，用可为空的生成列模拟，多个 NULL 不冲突）
+    default_owner = models.GeneratedField(
+        expression=models.Case(models.When(is_default=True, then=models.F('user')), default=None),
+        output_field=models.IntegerField(null=True),
+        db_persist=True,
+        verbose_name="默认地址所属用户",
+    )
 
     class Meta:
         verbose_name = "地址记录"
         verbose_name_plural = "地址记录"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id'], name='location_user_created_idx'),
+            models.Index(fields=['user', 'is_default'], name='location_user_default_idx'),
+            models.Index(fields=['user', 'geohash'], name='location_user_geohash_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['default_owner'], name='location_one_default_per_user'),
+        ]
 
     def __str__(self):
         return f"{self.name}（{self.user.username}）"
@@ -34,30 +63,103 @@ class Location(models.Model):
             if not (-180 <= float(self.longitude) <= 180):
                 raise ValidationError({"longitude": "经度必须在-180到180之间"})
 
-        # 确保每个用户最多只有一个默认地址
-        if self.is_default:
-            existing_default = Location.objects.filter(
-                user=self.user,
-                is_default=True
-            ).exclude(id=self.id if self.id else None)
+        # 每个用户最多一个默认地址由数据库唯一约束保证，保存时自动取消原默认地址
 
-            if existing_default.exists():
-                raise ValidationError({"is_default": "每个用户只能有一个默认地址"})
+    def update_geohash(self):
+        from .geo import encode
+        if self.latitude is not None and self.longitude is not None:
+            self.geohash = encode(float(self.latitude), float(self.longitude))
+        else:
+            self.geohash = ''
 
     def save(self, *args, **kwargs):
-        from django.db import transaction
-        try:
-            with transaction.atomic():
-                self.full_clean()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'geohash'}
+        pk, adding = self.pk, self._state.adding
+
+        def attempt():
+            # 重试前恢复主键，回滚的 INSERT 重新插入
+            self.pk, self._state.adding = pk, adding
+            with transaction.atomic(using=kwargs.get('using')):
+                # 用户外键和唯一约束交给数据库检查，不预先查询
+                self.full_clean(exclude=['user'], validate_unique=False, validate_constraints=False)
+                self.update_geohash()
                 if self.is_default:
-                    Location.objects.filter(user=self.user, is_default=True).exclude(
+                    _lock_user(self.user_id)
+                    Location.objects.filter(user_id=self.user_id, is_default=True).exclude(
                         id=self.id if self.id else None
-                    ).update(is_default=False)
-                super().save(*args, **kwargs)
+                    ).update(is_default=False, updated_at=timezone.now())
+                super(Location, self).save(*args, **kwargs)
+
+        try:
+            _retry_on_lock_error(attempt, kwargs.get('using') or router.db_for_write(Location, instance=self))
         except ValidationError as e:
             print(f"保存地址失败: {e}")
             raise
 
+    @classmethod
+    def set_default(cls, user_id, location_id):
+        """把用户的某个地址设为默认地址，地址不存在或不属于该用户时抛出 Location.DoesNotExist
+
+        锁住该地址行和用户行，同一用户的默认地址切换依次进行；
+        MySQL 上取消原默认地址和设置新默认地址在同一条 UPDATE 中完成。
+        遇到死锁或锁等待超时时整个事务重试（已在外层事务中时直接抛出）。
+        """
+        return _retry_on_lock_error(lambda: cls._set_default(user_id, location_id), router.db_for_write(cls))
+
+    @classmethod
+    def _set_default(cls, user_id, location_id):
+        with transaction.atomic():
+            location = cls.objects.select_for_update().select_related('user').get(pk=location_id, user_id=user_id)
+            if location.is_default:
+                return location
+            now = timezone.now()
+            rows = cls.objects.filter(models.Q(is_default=True) | models.Q(pk=location_id), user_id=user_id)
+            if connections[router.db_for_write(cls)].vendor == 'mysql':
+                # MySQL 按 ORDER BY 顺序逐行更新并检查唯一约束：先取消原默认地址再设置新的，一条语句完成交换
+                rows.order_by('-is_default').update(
+                    is_default=models.Case(models.When(pk=location_id, then=models.Value(True)),
+                                           default=models.Value(False)),
+                    updated_at=now,
+                )
+            else:
+                # 其他数据库不保证 UPDATE 的行顺序，分两步执行
+                rows.filter(is_default=True).update(is_default=False, updated_at=now)
+                rows.filter(pk=location_id).update(is_default=True, updated_at=now)
+            # 批量 UPDATE 不触发 post_save 信号，提交后手动使仪表盘缓存失效
+            transaction.on_commit(lambda: bump_user_version(user_id))
+        location.is_default, location.updated_at = True, now
+        return location
+
+
+def _lock_user(user_id):
+    """锁住用户行，与 Location.set_default 互斥"""
+    list(User.objects.select_for_update().filter(pk=user_id).values_list('pk', flat=True))
+
+
+def _is_lock_error(error):
+    """MySQL 死锁（1213）、锁等待超时（1205），或 SQLite 的 database is locked"""
+    if error.args and error.args[0] in (1205, 1213):
+        return True
+    message = str(error).lower()
+    return 'deadlock' in message or 'is locked' in message
+
+
+def _retry_on_lock_error(func, using):
+    """执行 func（自带事务），遇到死锁或锁等待超时时随机退避后重试
+
+    死锁时数据库已回滚整个事务，只有 func 的事务就是最外层事务时重试才安全。
+    """
+    retries = 0 if connections[using].in_atomic_block else LOCK_RETRIES
+    for attempt in range(retries + 1):
+        try:
+            return func()
+        except OperationalError as e:
+            if attempt == retries or not _is_lock_error(e):
+                raise
+            time.sleep(random.uniform(0, 0.01 * 2 ** attempt))
+
 
 class CheckIn(models.Model):
     """打卡记录模型"""
@@ -84,38 +186,95 @@ class CheckIn(models.Model):
     )
     notes = models.TextField(blank=True, null=True, verbose_name="备注")
     created_at = models.DateTimeField(default=timezone.now, verbose_name="打卡时间")
+    # 按 TIME_ZONE 计算的打卡日期，冗余存储以便走索引；历史重复记录保留为空
+    checkin_date = models.DateField(null=True, blank=True, editable=False, verbose_name="打卡日期")
 
     class Meta:
         verbose_name = "打卡记录"
         verbose_name_plural = "打卡记录"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='checkin_user_created_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'checkin_date'], name='checkin_unique_user_date'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} {self.created_at.strftime('%Y-%m-%d')} {self.get_status_display()}"
 
     def clean(self):
-        # 检查是否重复打卡
-        today = date.today()
-        if not self.pk:  # 新记录才检查
-            if CheckIn.objects.filter(
-                    user=self.user,
-                    created_at__date=today
-            ).exists():
-                raise ValidationError("今天已经打卡，不能重复打卡")
-
-        # 检查打卡地点是否属于当前用户
-        if self.location and self.location.user != self.user:
+        # 检查打卡地点是否属于当前用户（按主键和用户走索引，不加载地址对象）
+        if self.location_id and not Location.objects.filter(
+                pk=self.location_id,
+                user_id=self.user_id
+        ).exists():
             raise ValidationError("打卡地点必须是用户自己创建的地址")
 
     def save(self, *args, **kwargs):
+        if self.checkin_date is None:
+            self.checkin_date = timezone.localdate(self.created_at)
         try:
-            self.full_clean()
-            super().save(*args, **kwargs)
+            # 重复打卡由 (user, checkin_date) 唯一约束在 INSERT 时拦截，不再预先查询；
+            # 外键存在性由数据库约束和 clean() 中的归属检查保证
+            self.full_clean(exclude=['user', 'location'], validate_unique=False, validate_constraints=False)
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+        except IntegrityError:
+            # 只有 checkin_unique_user_date 冲突才是重复打卡，其他约束错误原样抛出；
+            # 保存在保存点中执行，回滚后可以继续查询
+            if not CheckIn.objects.filter(user_id=self.user_id, checkin_date=self.checkin_date).exclude(
+                    pk=self.pk).exists():
+                raise
+            raise ValidationError("今天已经打卡，不能重复打卡", code='duplicate_checkin')
         except ValidationError as e:
             print(f"打卡记录保存失败: {e}")
             raise
 
 
+class CheckInStats(models.Model):
+    """用户打卡汇总（连续打卡天数等），随打卡记录增删增量维护"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='checkin_stats', verbose_name="用户")
+    total_count = models.PositiveIntegerField(default=0, verbose_name="打卡总次数")
+    current_streak = models.PositiveIntegerField(default=0, verbose_name="当前连续天数")
+    longest_streak = models.PositiveIntegerField(default=0, verbose_name="最长连续天数")
+    last_checkin_date = models.DateField(null=True, blank=True, verbose_name="最近打卡日期")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新时间")
+
+    class Meta:
+        verbose_name = "打卡统计"
+        verbose_name_plural = "打卡统计"
+
+    def __str__(self):
+        return f"{self.user_id} 连续{self.current_streak}天"
+
+    def streak_on(self, today):
+        """截至 today 的连续打卡天数（昨天之前中断的连续记录视为0）"""
+        if self.last_checkin_date is None or (today - self.last_checkin_date).days > 1:
+            return 0
+        return self.current_streak
+
+
+class CheckInMonthlyStats(models.Model):
+    """用户每月各打卡状态的次数"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='checkin_monthly_stats', verbose_name="用户")
+    month = models.DateField(verbose_name="月份")  # 当月1日
+    completed = models.PositiveIntegerField(default=0, verbose_name="已完成")
+    late = models.PositiveIntegerField(default=0, verbose_name="迟到")
+    absent = models.PositiveIntegerField(default=0, verbose_name="缺席")
+
+    class Meta:
+        verbose_name = "月度打卡统计"
+        verbose_name_plural = "月度打卡统计"
+        ordering = ['-month']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'month'], name='checkin_monthly_unique_user_month'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.month:%Y-%m}"
+
+
 class Activity(models.Model):
     """活动记录模型"""
     CATEGORY_CHOICES = (
@@ -151,6 +310,9 @@ class Activity(models.Model):
         verbose_name = "活动记录"
         verbose_name_plural = "活动记录"
         ordering = ['-start_time']
+        indexes = [
+            models.Index(fields=['user', 'start_time', 'id'], name='activity_user_start_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -169,12 +331,117 @@ class Activity(models.Model):
             raise
 
 
+# 信号：打卡记录增删时在同一事务内更新打卡统计
+@receiver(post_save, sender=CheckIn)
+def update_checkin_stats_on_save(sender, instance, created, **kwargs):
+    from .stats import record_checkin, refresh_month
+    if kwargs.get('raw') or instance.checkin_date is None:
+        return
+    if created:
+        record_checkin(instance.user_id, instance.checkin_date, instance.status)
+    else:
+        # 修改记录可能改变状态，重新统计该月
+        refresh_month(instance.user_id, instance.checkin_date)
+
+
+@receiver(post_delete, sender=CheckIn)
+def update_checkin_stats_on_delete(sender, instance, origin=None, **kwargs):
+    from .stats import remove_checkin, schedule_rebuild
+    origin_model = origin.model if isinstance(origin, models.QuerySet) else type(origin)
+    if instance.checkin_date is None or issubclass(origin_model, User):
+        # 删除用户（单个或批量）时统计随之级联删除
+        return
+    if isinstance(origin, CheckIn):
+        remove_checkin(instance.user_id, instance.checkin_date, instance.status)
+    else:
+        # 批量删除：提交后每个用户只重建一次，避免逐条重算
+        schedule_rebuild(instance.user_id)
+
+
+# 信号：新增或删除已结束月份的活动、或修改任意活动时，使已缓存的热力图月份失效
+@receiver(post_save, sender=Activity)
+@receiver(post_delete, sender=Activity)
+def invalidate_heatmap_history(sender, instance, signal, using, created=False, **kwargs):
+    from .heatmap import bump_history_version, touches_history
+    # 修改时不知道原来的开始时间，总是失效；新增和删除只看该活动是否在已结束的月份
+    modified = signal is post_save and not created
+    if modified or touches_history(instance.start_time):
+        user_id = instance.user_id
+        transaction.on_commit(lambda: bump_history_version(user_id), using=using)
+
+
+# 信号：地址、打卡、活动变更时使该用户的仪表盘缓存失效
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+@receiver(post_save, sender=CheckIn)
+@receiver(post_delete, sender=CheckIn)
+@receiver(post_save, sender=Activity)
+@receiver(post_delete, sender=Activity)
+def invalidate_dashboard_cache(sender, instance, using, **kwargs):
+    # 提交后再递增版本号：事务内递增时，其他请求可能在提交前读到旧数据并缓存到新版本下
+    user_id = instance.user_id
+    transaction.on_commit(lambda: bump_user_version(user_id), using=using)
+
+
+class AudioBlob(models.Model):
+    """按内容哈希存储的音频文件，相同内容的音乐共用一份文件"""
+    sha256 = models.CharField(max_length=64, unique=True, verbose_name="SHA-256")
+    file = models.FileField(upload_to='music/blobs/', verbose_name="音频文件")
+    size = models.BigIntegerField(verbose_name="文件大小")
+    ref_count = models.PositiveIntegerField(default=0, verbose_name="引用次数")
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="创建时间")
+    # 以下由 audio.py 在上传后解析文件头部得到，metadata_at 为空表示尚未解析
+    format = models.CharField(max_length=10, blank=True, verbose_name="格式")
+    duration = models.FloatField(null=True, blank=True, verbose_name="时长（秒）")
+    bitrate = models.PositiveIntegerField(null=True, blank=True, verbose_name="比特率")
+    sample_rate = models.PositiveIntegerField(null=True, blank=True, verbose_name="采样率")
+    channels = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name="声道数")
+    peaks = models.BinaryField(null=True, blank=True, verbose_name="波形峰值")
+    cover_image = models.ImageField(upload_to='music_covers/embedded/', blank=True, verbose_name="内嵌封面")
+    metadata_at = models.DateTimeField(null=True, blank=True, verbose_name="元数据解析时间")
+
+    class Meta:
+        verbose_name = "音频文件"
+        verbose_name_plural = "音频文件"
+
+    def __str__(self):
+        return self.sha256
+
+
+class MusicUpload(models.Model):
+    """分块上传会话，finalize 之前数据保存在临时文件中"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='music_uploads', verbose_name="用户")
+    title = models.CharField(max_length=200, verbose_name="音乐标题")
+    artist = models.CharField(max_length=200, blank=True, verbose_name="艺术家")
+    filename = models.CharField(max_length=255, verbose_name="原始文件名")
+    total_size = models.BigIntegerField(verbose_name="文件总大小")
+    received_bytes = models.BigIntegerField(default=0, verbose_name="已接收字节数")
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="创建时间")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新时间")
+
+    class Meta:
+        verbose_name = "分块上传"
+        verbose_name_plural = "分块上传"
+
+    def __str__(self):
+        return f"{self.filename}（{self.received_bytes}/{self.total_size}）"
+
+
 class Music(models.Model):
     """音乐模型，用于存储用户上传的音乐"""
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='musics')
     title = models.CharField(max_length=200, verbose_name="音乐标题")
     artist = models.CharField(max_length=200, blank=True, verbose_name="艺术家")
     audio_file = models.FileField(upload_to='music/', verbose_name="音频文件")
+    blob = models.ForeignKey(
+        AudioBlob,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='musics',
+        verbose_name="音频内容"
+    )
     cover_image = models.ImageField(upload_to='music_covers/', blank=True, null=True, verbose_name="封面图片")
     uploaded_at = models.DateTimeField(default=timezone.now, verbose_name="上传时间")
 
@@ -182,6 +449,43 @@ class Music(models.Model):
         verbose_name = "音乐"
         verbose_name_plural = "音乐"
         ordering = ['-uploaded_at']
+        indexes = [
+            models.Index(fields=['user', 'uploaded_at'], name='music_user_uploaded_idx'),
+            # 输入联想的标题前缀匹配；全文检索的 FULLTEXT 索引只在 MySQL 上创建（见迁移 0009）
+            models.Index(fields=['user', 'title'], name='music_user_title_idx'),
+        ]
 
     def __str__(self):
         return self.title
+
+
+# 信号：封面保存后在后台生成缩略图（原图未变化时不会重复生成）
+@receiver(post_save, sender=Music)
+def generate_cover_thumbnails(sender, instance, **kwargs):
+    from .thumbnails import schedule_thumbnails
+    schedule_thumbnails(instance.cover_image)
+
+
+# 信号：音乐增删改时使该用户的搜索索引失效（见 search.py）
+@receiver(post_save, sender=Music)
+@receiver(post_delete, sender=Music)
+def invalidate_music_search(sender, instance, using, **kwargs):
+    from .search import bump_search_version
+    user_id = instance.user_id
+    transaction.on_commit(lambda: bump_search_version(user_id), using=using)
+
+
+# 信号：删除音乐时释放其引用的音频文件
+@receiver(post_delete, sender=Music)
+def release_music_blob(sender, instance, **kwargs):
+    if instance.blob_id:
+        from .uploads import release_blob
+        release_blob(instance.blob_id)
+
+
+# 信号：删除音乐或音频文件记录后，在事务提交时删除不再被引用的音频、封面及其缩略图
+@receiver(post_delete, sender=Music)
+@receiver(post_delete, sender=AudioBlob)
+def delete_record_files(sender, instance, **kwargs):
+    from .media_files import delete_field_files_on_commit
+    delete_field_files_on_commit(instance)
@@ -0,0 +1,107 @@
+"""游标（keyset）分页工具
+
+按 (时间字段, id) 倒序翻页，下一页条件为 "时间 < 游标时间，或时间相同且 id < 游标 id"，
+不使用 OFFSET，因此任意深度的翻页代价都与第一页相同。
+"""
+import base64
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = getattr(settings, 'DASHBOARD_PAGE_SIZE', 20)
+MAX_PAGE_SIZE = getattr(settings, 'DASHBOARD_MAX_PAGE_SIZE', 100)
+
+
+class InvalidCursor(ValueError):
+    """游标格式错误"""
+
+
+def encode_cursor(value, pk):
+    """将 (时间, id) 编码为URL安全的游标字符串"""
+    raw = f"{value.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """解析游标字符串，返回 (时间, id)"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        value, pk = base64.urlsafe_b64decode(padded.encode()).decode().split('|', 1)
+        return datetime.fromisoformat(value), int(pk)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor(f"无效的分页游标: {cursor}") from e
+
+
+def parse_page_size(value, default=DEFAULT_PAGE_SIZE):
+    """解析每页条数，限制在 1 ~ MAX_PAGE_SIZE 之间"""
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+class KeysetPage:
+    """一页结果及翻到下一页所需的游标"""
+
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+        # 下一页的查询字符串（不含 ?），由 paginate_request 填写
+        self.next_query = ''
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+
+def paginate_keyset(queryset, field, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """按 (field, id) 倒序取一页数据
+
+    多取一条用来判断是否还有下一页；游标无效时从第一页开始。
+    """
+    if cursor:
+        try:
+            value, pk = decode_cursor(cursor)
+        except InvalidCursor:
+            pass
+        else:
+            queryset = queryset.filter(
+                Q(**{f'{field}__lt': value}) | Q(**{field: value, 'id__lt': pk})
+            )
+
+    rows = list(queryset.order_by(f'-{field}', '-id')[:page_size + 1])
+    items = rows[:page_size]
+    next_cursor = None
+    if len(rows) > page_size:
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, field), last.pk)
+    return KeysetPage(items, next_cursor)
+
+
+def paginate_request(request, queryset, field):
+    """从请求参数 cursor / page_size 读取分页条件
+
+    下一页的查询字符串保留 page_size 等其他参数，只替换 cursor。
+    """
+    page = paginate_keyset(
+        queryset,
+        field,
+        cursor=request.GET.get('cursor'),
+        page_size=parse_page_size(request.GET.get('page_size')),
+    )
+    if page.has_next:
+        params = request.GET.copy()
+        params['cursor'] = page.next_cursor
+        page.next_query = params.urlencode()
+    return page
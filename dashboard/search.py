@@ -0,0 +1,212 @@
+"""音乐库搜索：按标题和艺术家检索、输入联想
+
+MySQL 使用 ngram 分词的 FULLTEXT 索引（见迁移 0009），中文标题不需要分词即可检索。
+其他数据库（开发环境的 SQLite）在进程内为每个用户建立单字和 bigram 的倒排索引：
+按查询词的 bigram（单字查询词用单字）求倒排表交集得到候选，再确认确实包含查询词。
+索引在音乐增删后按版本号失效（信号见 models.py），下次搜索时重建。
+
+两种实现都要求每个查询词都出现在标题或艺术家中，按相关度排序
+（标题完全相同 > 标题前缀 > 标题包含 > 艺术家匹配），相关度相同时新上传的在前。
+"""
+import heapq
+import threading
+import unicodedata
+from collections import OrderedDict, defaultdict
+
+from django.conf import settings
+from django.db import connections, router
+from django.db.models import Case, IntegerField, Value, When
+from django.db.models.expressions import RawSQL
+
+from .cache import bump_version, get_version
+from .models import Music
+
+# 最多返回的结果数（翻页上限），避免宽泛查询排序全部匹配项
+MAX_RESULTS = getattr(settings, 'MUSIC_SEARCH_MAX_RESULTS', 1000)
+# 进程内最多保留多少个用户的倒排索引，超出时淘汰最久未使用的
+INDEX_USERS = getattr(settings, 'MUSIC_SEARCH_INDEX_USERS', 32)
+# MySQL ngram_token_size（默认 2），比它短的查询词按前缀匹配
+NGRAM_SIZE = 2
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def normalize(text):
+    """全角转半角、忽略大小写、合并空白"""
+    return ' '.join(unicodedata.normalize('NFKC', text or '').casefold().split())
+
+
+def _version_key(user_id):
+    return f'music_search:{user_id}:version'
+
+
+def get_search_version(user_id):
+    # 版本号被淘汰后以纳秒时间戳重新生成，进程内按旧版本建立的索引不会被误用
+    return get_version(_version_key(user_id))
+
+
+def bump_search_version(user_id):
+    """用户的音乐增删改后调用，使进程内的倒排索引失效"""
+    bump_version(_version_key(user_id))
+
+
+def _bigrams(text):
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def _grams(text):
+    """查询词的索引项：bigram，单字时为其本身"""
+    return _bigrams(text) or {text}
+
+
+def _term_score(term, title, artist):
+    """单个查询词的相关度，未匹配时为 0"""
+    if title == term:
+        return 8
+    if title.startswith(term):
+        return 4
+    if term in title:
+        return 2
+    if artist.startswith(term):
+        return 1.5
+    if term in artist:
+        return 1
+    return 0
+
+
+class MusicIndex:
+    """一个用户音乐库的单字 + bigram 倒排索引"""
+
+    def __init__(self, version, rows):
+        self.version = version
+        # id -> (标题, 艺术家, 上传时间戳)，均已规范化
+        self.docs = {}
+        self.postings = defaultdict(set)
+        for pk, title, artist, uploaded_at in rows:
+            title, artist = normalize(title), normalize(artist)
+            self.docs[pk] = (title, artist, uploaded_at.timestamp())
+            # 标题和艺术家分别切分，不产生跨字段的 bigram
+            for gram in set(title) | set(artist) | _bigrams(title) | _bigrams(artist):
+                self.postings[gram].add(pk)
+
+    def candidates(self, term):
+        """可能包含查询词的 id"""
+        lists = sorted((self.postings.get(gram, ()) for gram in _grams(term)), key=len)
+        if not lists[0]:
+            return set()
+        result = set(lists[0])
+        for posting in lists[1:]:
+            result &= posting
+            if not result:
+                break
+        return result
+
+    def search(self, terms, limit):
+        """按相关度返回前 limit 个 (id, 相关度)"""
+        candidates = None
+        for term in sorted(terms, key=len, reverse=True):
+            found = self.candidates(term)
+            candidates = found if candidates is None else candidates & found
+            if not candidates:
+                return []
+
+        def scored():
+            for pk in candidates:
+                title, artist, uploaded = self.docs[pk]
+                total = 0
+                for term in terms:
+                    score = _term_score(term, title, artist)
+                    if not score:
+                        break
+                    total += score
+                else:
+                    yield total, uploaded, pk
+
+        return [(pk, score) for score, _, pk in heapq.nlargest(limit, scored())]
+
+
+def get_index(user_id):
+    """读取（必要时重建）用户的倒排索引"""
+    version = get_search_version(user_id)
+    with _indexes_lock:
+        index = _indexes.get(user_id)
+        if index is not None and index.version == version:
+            _indexes.move_to_end(user_id)
+            return index
+    # 在锁外查询和构建，不阻塞其他用户的搜索
+    rows = Music.objects.filter(user_id=user_id).values_list('id', 'title', 'artist', 'uploaded_at')
+    index = MusicIndex(version, rows.iterator(chunk_size=5000))
+    with _indexes_lock:
+        _indexes[user_id] = index
+        _indexes.move_to_end(user_id)
+        while len(_indexes) > INDEX_USERS:
+            _indexes.popitem(last=False)
+    return index
+
+
+def _use_fulltext():
+    return connections[router.db_for_read(Music)].vendor == 'mysql'
+
+
+def _boolean_query(terms):
+    # 每个词都必须出现；ngram 分词下带引号的词要求其 n-gram 连续出现，相当于包含该词
+    parts = []
+    for term in terms:
+        term = term.replace('"', ' ').strip()
+        if term:
+            parts.append(f'+{term}*' if len(term) < NGRAM_SIZE else f'+"{term}"')
+    return ' '.join(parts)
+
+
+def _fulltext_queryset(user, query, terms):
+    return Music.objects.filter(user=user).select_related('blob').annotate(
+        relevance=RawSQL('MATCH (title, artist) AGAINST (%s IN BOOLEAN MODE)', [_boolean_query(terms)]),
+        title_rank=Case(
+            When(title__iexact=query, then=Value(2)),
+            When(title__istartswith=query, then=Value(1)),
+            default=Value(0),
+            output_field=IntegerField(),
+        ),
+    ).filter(relevance__gt=0).order_by('-title_rank', '-relevance', '-uploaded_at', '-id')
+
+
+def search_music(user, query, offset=0, limit=20):
+    """搜索用户的音乐，返回 (本页的 Music 列表, 是否还有下一页)"""
+    query = normalize(query)
+    terms = query.split()
+    end = min(offset + limit, MAX_RESULTS)
+    if not terms or offset >= end:
+        return [], False
+
+    if _use_fulltext():
+        musics = list(_fulltext_queryset(user, query, terms)[offset:end + 1])
+        return musics[:end - offset], len(musics) > end - offset and end < MAX_RESULTS
+
+    ranked = get_index(user.pk).search(terms, end + 1)
+    ids = [pk for pk, _ in ranked[offset:end]]
+    found = Music.objects.select_related('blob').in_bulk(ids)
+    musics = [found[pk] for pk in ids if pk in found]
+    return musics, len(ranked) > end and end < MAX_RESULTS
+
+
+def suggest_music(user, query, limit=8):
+    """输入联想：返回 [{id, title, artist}]，标题前缀匹配优先"""
+    query = normalize(query)
+    if not query:
+        return []
+    fields = ('id', 'title', 'artist')
+    if _use_fulltext():
+        # 标题前缀走 (user, title) 索引，不足时再用全文索引补充
+        results = list(Music.objects.filter(user=user, title__istartswith=query)
+                       .order_by('title', '-id').values(*fields)[:limit])
+        if len(results) < limit:
+            seen = {row['id'] for row in results}
+            for row in _fulltext_queryset(user, query, query.split()).values(*fields)[:limit]:
+                if row['id'] not in seen and len(results) < limit:
+                    results.append(row)
+        return results
+
+    ids = [pk for pk, _ in get_index(user.pk).search(query.split(), limit)]
+    rows = {row['id']: row for row in Music.objects.filter(pk__in=ids).values(*fields)}
+    return [rows[pk] for pk in ids if pk in rows]
@@ -0,0 +1,181 @@
+"""打卡统计的增量维护与重建
+
+CheckInStats（每用户一行）和 CheckInMonthlyStats（每用户每月一行）在打卡记录
+保存、删除时于同一事务内更新，读取统计只需按主键取一行。
+按时间顺序新增打卡是 O(1) 更新；补录过去日期或删除记录时只重算该用户的连续天数。
+rebuild_checkin_stats 命令可从原始记录批量重建全部统计。
+"""
+import threading
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F
+
+from .models import CheckIn, CheckInStats, CheckInMonthlyStats
+
+STATUS_FIELDS = tuple(status for status, _ in CheckIn.STATUS_CHOICES)
+
+_pending = threading.local()
+
+
+def month_of(day):
+    return day.replace(day=1)
+
+
+def compute_streaks(dates):
+    """根据升序且不重复的日期序列计算 (当前连续天数, 最长连续天数, 最近日期)"""
+    current = longest = 0
+    previous = None
+    for day in dates:
+        if previous is not None and day - previous == timedelta(days=1):
+            current += 1
+        else:
+            current = 1
+        longest = max(longest, current)
+        previous = day
+    return current, longest, previous
+
+
+def _recompute_streaks(stats):
+    dates = CheckIn.objects.filter(
+        user_id=stats.user_id,
+        checkin_date__isnull=False
+    ).order_by('checkin_date').values_list('checkin_date', flat=True)
+    stats.current_streak, stats.longest_streak, stats.last_checkin_date = compute_streaks(dates)
+
+
+def _locked_stats(user_id):
+    stats, _ = CheckInStats.objects.get_or_create(user_id=user_id)
+    return CheckInStats.objects.select_for_update().get(pk=stats.pk)
+
+
+def _bump_month(user_id, day, status, delta):
+    if status not in STATUS_FIELDS:
+        return
+    month = month_of(day)
+    if delta > 0:
+        CheckInMonthlyStats.objects.get_or_create(user_id=user_id, month=month)
+        CheckInMonthlyStats.objects.filter(user_id=user_id, month=month).update(**{status: F(status) + 1})
+    else:
+        CheckInMonthlyStats.objects.filter(
+            user_id=user_id, month=month, **{f'{status}__gt': 0}
+        ).update(**{status: F(status) - 1})
+
+
+def record_checkin(user_id, day, status):
+    """新增一条打卡记录后更新统计"""
+    with transaction.atomic():
+        stats = _locked_stats(user_id)
+        stats.total_count += 1
+        last = stats.last_checkin_date
+        if last is None or day > last:
+            stats.current_streak = stats.current_streak + 1 if last == day - timedelta(days=1) else 1
+            stats.longest_streak = max(stats.longest_streak, stats.current_streak)
+            stats.last_checkin_date = day
+        else:
+            # 补录过去的日期可能连接两段连续记录
+            _recompute_streaks(stats)
+        stats.save()
+        _bump_month(user_id, day, status, 1)
+
+
+def remove_checkin(user_id, day, status):
+    """删除一条打卡记录后更新统计"""
+    with transaction.atomic():
+        stats = CheckInStats.objects.select_for_update().filter(user_id=user_id).first()
+        if stats is None:
+            return
+        stats.total_count = max(stats.total_count - 1, 0)
+        _recompute_streaks(stats)
+        stats.save()
+        _bump_month(user_id, day, status, -1)
+
+
+def refresh_month(user_id, day):
+    """重新统计某用户某月各状态的次数（打卡状态被修改时使用）"""
+    month = month_of(day)
+    next_month = (month + timedelta(days=32)).replace(day=1)
+    counts = dict.fromkeys(STATUS_FIELDS, 0)
+    counts.update(
+        CheckIn.objects.filter(
+            user_id=user_id,
+            checkin_date__gte=month,
+            checkin_date__lt=next_month
+        ).order_by().values_list('status').annotate(n=Count('id'))
+    )
+    counts = {status: counts[status] for status in STATUS_FIELDS}
+    CheckInMonthlyStats.objects.update_or_create(user_id=user_id, month=month, defaults=counts)
+
+
+def _flush_pending():
+    pending = getattr(_pending, 'users', None)
+    _pending.users = None
+    if pending:
+        rebuild_stats(pending)
+
+
+def schedule_rebuild(user_id):
+    """批量删除等场景：在事务提交后对每个用户只重建一次
+
+    每次调用都注册提交回调，由第一个执行的回调取走全部待重建的用户，其余回调不做事。
+    事务回滚时回调被丢弃，已记下的用户留到下一次提交时一并重建（从原始记录重建，多做一次也无妨），
+    不会因为残留的集合而再也不注册回调。
+    """
+    users = getattr(_pending, 'users', None)
+    if users is None:
+        users = _pending.users = set()
+    users.add(user_id)
+    transaction.on_commit(_flush_pending)
+
+
+def rebuild_stats(user_ids):
+    """从原始打卡记录重建一批用户的统计，返回处理的用户数"""
+    user_ids = sorted(set(user_ids))
+    if not user_ids:
+        return 0
+
+    per_user = {user_id: [] for user_id in user_ids}
+    rows = CheckIn.objects.filter(
+        user_id__in=user_ids,
+        checkin_date__isnull=False
+    ).order_by('user_id', 'checkin_date').values_list('user_id', 'checkin_date', 'status')
+    for user_id, day, status in rows:
+        per_user[user_id].append((day, status))
+
+    summaries, monthly = [], []
+    for user_id, records in per_user.items():
+        current, longest, last = compute_streaks(day for day, _ in records)
+        summaries.append(CheckInStats(
+            user_id=user_id,
+            total_count=len(records),
+            current_streak=current,
+            longest_streak=longest,
+            last_checkin_date=last,
+        ))
+        months = {}
+        for day, status in records:
+            counts = months.setdefault(month_of(day), dict.fromkeys(STATUS_FIELDS, 0))
+            if status in counts:
+                counts[status] += 1
+        monthly.extend(
+            CheckInMonthlyStats(user_id=user_id, month=month, **counts) for month, counts in months.items()
+        )
+
+    with transaction.atomic():
+        CheckInStats.objects.filter(user_id__in=user_ids).delete()
+        CheckInMonthlyStats.objects.filter(user_id__in=user_ids).delete()
+        CheckInStats.objects.bulk_create(summaries, batch_size=1000)
+        CheckInMonthlyStats.objects.bulk_create(monthly, batch_size=1000)
+    return len(user_ids)
+
+
+def get_user_stats(user, today):
+    """读取用户打卡统计（按主键取一行），未有记录时返回全0"""
+    stats = CheckInStats.objects.filter(user=user).first()
+    if stats is None:
+        return {'total_count': 0, 'current_streak': 0, 'longest_streak': 0}
+    return {
+        'total_count': stats.total_count,
+        'current_streak': stats.streak_on(today),
+        'longest_streak': stats.longest_streak,
+    }
@@ -0,0 +1,152 @@
+"""支持 HTTP Range 的文件流式响应
+
+按固定大小分块读取文件，内存占用与文件大小无关；支持单段、多段 Range，
+ETag / Last-Modified 条件请求及 If-Range。配置 MEDIA_ACCEL_REDIRECT_PREFIX 或
+MEDIA_SENDFILE_HEADER 时，改由前端服务器（nginx / Apache）直接发送文件。
+"""
+import mimetypes
+import os
+import uuid
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+CHUNK_SIZE = getattr(settings, 'MEDIA_STREAM_CHUNK_SIZE', 64 * 1024)
+# 例如 '/protected-media/'，对应 nginx 中 internal 的 location
+ACCEL_REDIRECT_PREFIX = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', None)
+# 例如 'X-Sendfile'（Apache mod_xsendfile）
+SENDFILE_HEADER = getattr(settings, 'MEDIA_SENDFILE_HEADER', None)
+# 单个请求允许的最大 Range 段数，防止构造大量小段消耗资源
+MAX_RANGES = 16
+
+
+def parse_range_header(header, size):
+    """解析 Range 头，返回 [(start, end), ...]（end 含）
+
+    头部格式错误时返回 None（按普通请求处理），所有段都无法满足时返回 []。
+    """
+    if not header or not header.startswith('bytes='):
+        return None
+    ranges = []
+    for spec in header[len('bytes='):].split(','):
+        spec = spec.strip()
+        if '-' not in spec:
+            return None
+        start, end = spec.split('-', 1)
+        try:
+            if start:
+                start = int(start)
+                end = int(end) if end else size - 1
+            elif end:
+                # 后缀形式 bytes=-500 表示最后500字节
+                start, end = max(size - int(end), 0), size - 1
+            else:
+                return None
+        except ValueError:
+            return None
+        if start >= size:
+            continue
+        if start > end:
+            return None
+        ranges.append((start, min(end, size - 1)))
+    if len(ranges) > MAX_RANGES:
+        return None
+    return ranges
+
+
+def _read_range(path, start, end):
+    """分块读取文件的 [start, end] 区间"""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _multipart(path, ranges, size, content_type, boundary):
+    for start, end in ranges:
+        yield (
+            f'\r\n--{boundary}\r\n'
+            f'Content-Type: {content_type}\r\n'
+            f'Content-Range: bytes {start}-{end}/{size}\r\n\r\n'
+        ).encode()
+        yield from _read_range(path, start, end)
+    yield f'\r\n--{boundary}--\r\n'.encode()
+
+
+def _not_modified(request, etag, mtime):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        return if_none_match == '*' or etag in [t.strip() for t in if_none_match.split(',')]
+    if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return if_modified_since is not None and int(mtime) <= if_modified_since
+
+
+def _if_range_matches(request, etag, mtime):
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == int(mtime)
+
+
+def _offload(path, content_type):
+    """交给前端服务器发送，Range 由前端服务器处理"""
+    response = HttpResponse(content_type=content_type)
+    if ACCEL_REDIRECT_PREFIX:
+        relative = os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, '/')
+        response['X-Accel-Redirect'] = ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + relative
+    else:
+        response[SENDFILE_HEADER] = path
+    return response
+
+
+def ranged_file_response(request, path, content_type=None):
+    """返回支持 Range 的文件响应"""
+    content_type = content_type or mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    stat = os.stat(path)
+    size = stat.st_size
+    etag = quote_etag(f'{size:x}-{stat.st_mtime_ns:x}')
+
+    if _not_modified(request, etag, stat.st_mtime):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    if ACCEL_REDIRECT_PREFIX or SENDFILE_HEADER:
+        response = _offload(path, content_type)
+    else:
+        ranges = None
+        if _if_range_matches(request, etag, stat.st_mtime):
+            ranges = parse_range_header(request.META.get('HTTP_RANGE'), size)
+
+        if ranges is None:
+            response = StreamingHttpResponse(_read_range(path, 0, size - 1), content_type=content_type)
+            response['Content-Length'] = str(size)
+        elif not ranges:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+        elif len(ranges) == 1:
+            start, end = ranges[0]
+            response = StreamingHttpResponse(_read_range(path, start, end), status=206, content_type=content_type)
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = str(end - start + 1)
+        else:
+            boundary = uuid.uuid4().hex
+            response = StreamingHttpResponse(
+                _multipart(path, ranges, size, content_type, boundary),
+                status=206,
+                content_type=f'multipart/byteranges; boundary={boundary}',
+            )
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Cache-Control'] = 'private, max-age=0, must-revalidate'
+    return response
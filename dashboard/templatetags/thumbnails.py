@@ -0,0 +1,40 @@
+"""缩略图模板标签
+
+用法：
+    {% load thumbnails %}
+    <img src="{{ music.cover_image|thumbnail:64 }}">
+    {% thumbnail_picture user.profile.avatar 256 alt="头像" css_class="rounded-full" %}
+"""
+from django import template
+from django.utils.html import format_html
+
+from dashboard.thumbnails import thumbnail_url
+
+register = template.Library()
+
+
+@register.filter
+def thumbnail(field_file, size):
+    """返回不小于 size 像素的 JPEG 缩略图URL"""
+    return thumbnail_url(field_file, int(size))
+
+
+@register.simple_tag
+def thumbnail_picture(field_file, size, alt='', css_class=''):
+    """输出 <picture>，支持 WebP 的浏览器加载 WebP，其余加载 JPEG"""
+    if not field_file:
+        return ''
+    size = int(size)
+    webp = thumbnail_url(field_file, size, ext='webp')
+    jpeg = thumbnail_url(field_file, size)
+    if webp == jpeg:
+        # 缩略图尚未生成，直接使用原图
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" width="{}" loading="lazy">',
+            jpeg, alt, css_class, size
+        )
+    return format_html(
+        '<picture><source srcset="{}" type="image/webp">'
+        '<img src="{}" alt="{}" class="{}" width="{}" loading="lazy"></picture>',
+        webp, jpeg, alt, css_class, size
+    )
@@ -0,0 +1,277 @@
+import random
+import threading
+from datetime import timedelta
+from unittest import mock, skipUnless
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, connection, connections, models
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from dashboard.models import Activity, CheckIn, Location, Music
+
+
+# 测试中不运行 collectstatic，模板里的 {% static %} 不查 manifest
+@override_settings(STORAGES={
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+class ConditionalPageTests(TestCase):
+    """地址页面的条件请求（conditional.py）"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='pass')
+        self.client.force_login(self.user)
+        self.url = reverse('location')
+        for i in range(3):
+            Location.objects.create(user=self.user, name=f'地址{i}', address=f'测试地址{i}')
+
+    def get_etag(self):
+        # 第一次访问时还没有 CSRF cookie，页面不带 ETag；第二次才带
+        self.client.get(self.url)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('ETag', response.headers)
+        return response.headers['ETag']
+
+    def test_matching_etag_returns_304_without_list_query(self):
+        etag = self.get_etag()
+        # 会话、用户和一条聚合查询，不查询地址列表
+        with self.assertNumQueries(3), CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers['ETag'], etag)
+        self.assertIn('no-cache', response.headers['Cache-Control'])
+        location_queries = [q['sql'] for q in queries if 'dashboard_location' in q['sql']]
+        self.assertEqual(len(location_queries), 1)
+        self.assertIn('COUNT(', location_queries[0].upper())
+
+    def test_added_row_changes_etag(self):
+        etag = self.get_etag()
+        Location.objects.create(user=self.user, name='新地址', address='新增')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_deleted_row_changes_etag(self):
+        etag = self.get_etag()
+        Location.objects.filter(user=self.user).order_by('id').first().delete()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_other_users_etag_does_not_validate(self):
+        # 两个用户都没有地址，聚合结果相同，ETag 只靠用户区分
+        Location.objects.filter(user=self.user).delete()
+        etag = self.get_etag()
+        other = User.objects.create_user('bob', password='pass')
+        # 同一个客户端切换用户，CSRF cookie 不变
+        self.client.force_login(other)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers.get('ETag'), etag)
+
+
+@override_settings(STORAGES={
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+class LoadMoreLinkTests(TestCase):
+    """列表页的“加载更多”链接保留 page_size 等查询参数"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='pass')
+        self.client.force_login(self.user)
+        for i in range(3):
+            Location.objects.create(user=self.user, name=f'地址{i}', address=f'测试地址{i}')
+
+    def test_next_page_keeps_page_size(self):
+        response = self.client.get(reverse('location'), {'page_size': 2})
+        page = response.context['locations']
+        self.assertEqual(len(page), 2)
+        self.assertContains(response, f'href="?page_size=2&amp;cursor={page.next_cursor}"')
+
+        response = self.client.get(reverse('location') + '?' + page.next_query)
+        page = response.context['locations']
+        self.assertEqual([location.name for location in page], ['地址0'])
+        self.assertFalse(page.has_next)
+
+
+class CheckInSaveTests(TestCase):
+    """CheckIn.save 只把 (user, checkin_date) 冲突转换为重复打卡"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='pass')
+
+    def test_duplicate_checkin(self):
+        CheckIn.objects.create(user=self.user)
+        with self.assertRaises(ValidationError) as cm:
+            CheckIn.objects.create(user=self.user)
+        self.assertEqual(cm.exception.code, 'duplicate_checkin')
+        self.assertEqual(CheckIn.objects.filter(user=self.user).count(), 1)
+
+    def test_other_integrity_errors_are_raised(self):
+        with mock.patch.object(models.Model, 'save', side_effect=IntegrityError('other constraint')):
+            with self.assertRaisesMessage(IntegrityError, 'other constraint'):
+                CheckIn.objects.create(user=self.user)
+
+
+class LocationNearbyApiTests(TestCase):
+    """附近地址接口（geo.py 的 geohash 前缀查询）"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='pass')
+        self.client.force_login(self.user)
+        self.url = reverse('location_nearby_api')
+        # 天安门、王府井（约 1.3 千米）和上海
+        for name, lat, lng in (('天安门', '39.908722', '116.397499'), ('王府井', '39.914578', '116.410829'),
+                               ('上海', '31.230416', '121.473701')):
+            Location.objects.create(user=self.user, name=name, address=name, latitude=lat, longitude=lng)
+
+    def names(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return [row['name'] for row in response.json()['results']]
+
+    def test_radius(self):
+        self.assertEqual(sorted(self.names(lat=39.91, lng=116.40, radius=3)), ['天安门', '王府井'])
+
+    def test_nearest(self):
+        self.assertEqual(self.names(lat=39.9087, lng=116.3975, n=2), ['天安门', '王府井'])
+
+    def test_bbox(self):
+        self.assertEqual(self.names(bbox='31,121,32,122'), ['上海'])
+
+    def test_other_users_locations_are_excluded(self):
+        other = User.objects.create_user('bob', password='pass')
+        self.client.force_login(other)
+        self.assertEqual(self.names(lat=39.91, lng=116.40, radius=3), [])
+
+
+class DefaultLocationConcurrencyTests(TransactionTestCase):
+    """多线程并发切换默认地址：每次操作都成功，最后一次操作的地址是唯一的默认地址"""
+
+    THREADS = 8
+    ROUNDS = 20
+
+    def test_concurrent_set_default_and_create(self):
+        user = User.objects.create_user('alice')
+        location_ids = [Location.objects.create(user=user, name=f'地址{i}', address=f'测试地址{i}').pk
+                        for i in range(4)]
+        barrier = threading.Barrier(self.THREADS)
+        lock = threading.Lock()
+        # (updated_at, 地址 id)，set_default 和新建默认地址都在锁住用户行后取时间
+        results, created, errors = [], [], []
+
+        def worker(index):
+            rng = random.Random(index)
+            try:
+                barrier.wait()
+                for _ in range(self.ROUNDS):
+                    if rng.random() < 0.8:
+                        location = Location.set_default(user.pk, rng.choice(location_ids))
+                    else:
+                        location = Location(user=user, name='新默认地址', address='并发测试', is_default=True)
+                        location.save()
+                        with lock:
+                            created.append(location.pk)
+                    with lock:
+                        results.append((location.updated_at, location.pk))
+            except Exception as e:
+                with lock:
+                    errors.append(repr(e))
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(results), self.THREADS * self.ROUNDS)
+        self.assertEqual(Location.objects.filter(pk__in=created, user=user).count(), len(created))
+        defaults = list(Location.objects.filter(user=user, is_default=True).values_list('pk', flat=True))
+        self.assertEqual(len(defaults), 1)
+        # 未被替换的默认地址来自时间最晚的那次操作（同一时刻的操作只可能是同一地址的重复设置）
+        latest = max(updated_at for updated_at, _ in results)
+        self.assertIn(defaults[0], {pk for updated_at, pk in results if updated_at == latest})
+
+
+def plan_problems(plan):
+    """从 EXPLAIN 输出中找出全表扫描和文件排序"""
+    problems = []
+    for line in plan.splitlines():
+        if connection.vendor == 'mysql':
+            # 传统格式以制表符分隔：id select_type table partitions type ...
+            columns = line.split('\t')
+            if len(columns) > 4 and columns[4] == 'ALL':
+                problems.append(f"全表扫描: {columns[2]}")
+            if 'Using filesort' in line:
+                problems.append("文件排序 (Using filesort)")
+        else:
+            if 'SCAN' in line and 'USING' not in line:
+                problems.append(f"全表扫描: {line.strip()}")
+            if 'TEMP B-TREE' in line:
+                problems.append(f"文件排序: {line.strip()}")
+    return problems
+
+
+@skipUnless(connection.vendor in ('mysql', 'sqlite'), "只解析 MySQL 和 SQLite 的 EXPLAIN 输出")
+class QueryPlanTests(TestCase):
+    """仪表盘各视图的热点查询走索引，不出现全表扫描或文件排序"""
+
+    USERS = 20
+    ROWS = 200
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        User.objects.bulk_create(User(username=f'plan_check_{i}') for i in range(cls.USERS))
+        # MySQL 的 bulk_create 不回填主键，需要重新查询
+        users = list(User.objects.filter(username__startswith='plan_check_').order_by('id'))
+        locations, checkins, activities, musics = [], [], [], []
+        for user in users:
+            for i in range(cls.ROWS):
+                moment = now - timedelta(days=i)
+                locations.append(Location(
+                    user=user, name=f'地点{i}', address='-', is_default=(i == 0), created_at=moment
+                ))
+                checkins.append(CheckIn(user=user, created_at=moment, checkin_date=timezone.localdate(moment)))
+                activities.append(Activity(
+                    user=user, title=f'活动{i}', start_time=moment,
+                    end_time=moment + timedelta(hours=1), created_at=moment
+                ))
+                musics.append(Music(user=user, title=f'音乐{i}', audio_file=f'music/{i}.mp3', uploaded_at=moment))
+        for model, objs in ((Location, locations), (CheckIn, checkins),
+                            (Activity, activities), (Music, musics)):
+            model.objects.bulk_create(objs, batch_size=1000)
+        # 让优化器拿到最新的统计信息；MySQL 的 ANALYZE TABLE 会隐式提交事务，依赖 InnoDB 的自动统计更新
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+        cls.user = users[0]
+
+    def hot_queries(self):
+        """各视图实际执行的查询，键为 "视图: 说明" """
+        user, today = self.user, timezone.localdate()
+        return {
+            'dashboard_view: 今日打卡': CheckIn.objects.filter(user=user, checkin_date=today),
+            'dashboard_view: 最近地址': Location.objects.filter(user=user).order_by('-created_at')[:1],
+            'dashboard_view: 最近活动': Activity.objects.filter(user=user).order_by('-start_time')[:3],
+            'location_view: 地址列表': Location.objects.filter(user=user).order_by('-created_at', '-id')[:21],
+            'checkin_view: 地址下拉': Location.objects.filter(user=user),
+            'activity_view: 活动列表': Activity.objects.filter(user=user).order_by('-start_time', '-id')[:21],
+            'music_view: 音乐列表': Music.objects.filter(user=user).order_by('-uploaded_at'),
+            'location: 默认地址': Location.objects.filter(user=user, is_default=True),
+        }
+
+    def test_hot_queries_use_indexes(self):
+        for name, queryset in self.hot_queries().items():
+            with self.subTest(name):
+                plan = queryset.explain()
+                self.assertEqual(plan_problems(plan), [], plan)
@@ -0,0 +1,123 @@
+"""封面与头像缩略图
+
+为每张原图生成固定尺寸的 WebP 和 JPEG 缩略图，与原图放在同一目录，文件名保留原图的扩展名，
+foo.jpg 和 foo.png 的缩略图不会互相覆盖：
+    music_covers/foo.jpg -> music_covers/foo.jpg.256.webp / music_covers/foo.jpg.256.jpg
+
+模型保存后在事务提交时提交到后台线程池生成，不占用请求时间；缩略图比原图旧时重新生成。
+已有图片可用 python manage.py generate_thumbnails 批量补齐。
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZES = tuple(getattr(settings, 'THUMBNAIL_SIZES', (64, 256, 512)))
+THUMBNAIL_QUALITY = getattr(settings, 'THUMBNAIL_QUALITY', 80)
+FORMATS = (('webp', 'WEBP'), ('jpg', 'JPEG'))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def variant_name(name, size, ext):
+    """原图存储名对应的缩略图存储名"""
+    return f'{name}.{size}.{ext}'
+
+
+def is_variant(name):
+    """判断存储名是否为缩略图（避免对缩略图再生成缩略图）"""
+    parts = os.path.basename(name).rsplit('.', 2)
+    return (len(parts) == 3 and parts[1].isdigit() and int(parts[1]) in THUMBNAIL_SIZES
+            and parts[2] in dict(FORMATS))
+
+
+def original_name(name):
+    """缩略图存储名对应的原图存储名"""
+    return name.rsplit('.', 2)[0]
+
+
+def pick_size(size):
+    """选择不小于 size 的最小缩略图尺寸，超出时取最大尺寸"""
+    for candidate in sorted(THUMBNAIL_SIZES):
+        if candidate >= size:
+            return candidate
+    return max(THUMBNAIL_SIZES)
+
+
+def generate_variants(name, force=False):
+    """为存储名为 name 的原图生成所有缩略图，返回生成的数量
+
+    只依赖文件路径，便于在进程池中调用。
+    """
+    from PIL import Image, ImageOps
+
+    source = default_storage.path(name)
+    if not os.path.exists(source):
+        return 0
+    source_mtime = os.path.getmtime(source)
+
+    pending = []
+    for size in THUMBNAIL_SIZES:
+        for ext, fmt in FORMATS:
+            target = default_storage.path(variant_name(name, size, ext))
+            if force or not os.path.exists(target) or os.path.getmtime(target) < source_mtime:
+                pending.append((size, target, fmt))
+    if not pending:
+        return 0
+
+    with Image.open(source) as image:
+        # JPEG 解码时直接按比例缩小，避免把整张大图解码到内存
+        image.draft('RGB', (max(THUMBNAIL_SIZES), max(THUMBNAIL_SIZES)))
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        # 从大到小依次缩放，每次以上一档结果为输入，减少重复计算
+        current = image
+        for size in sorted({size for size, _, _ in pending}, reverse=True):
+            current = current.copy()
+            current.thumbnail((size, size), Image.LANCZOS)
+            for pending_size, target, fmt in pending:
+                if pending_size != size:
+                    continue
+                tmp = f'{target}.tmp'
+                current.save(tmp, fmt, quality=THUMBNAIL_QUALITY, optimize=True)
+                os.replace(tmp, target)
+    return len(pending)
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='thumbnails')
+        return _executor
+
+
+def _run(name):
+    try:
+        generate_variants(name)
+    except Exception:
+        logger.exception("生成缩略图失败: %s", name)
+
+
+def schedule_thumbnails(field_file):
+    """在事务提交后于后台线程生成缩略图"""
+    if not field_file or not field_file.name or is_variant(field_file.name):
+        return
+    name = field_file.name
+    transaction.on_commit(lambda: _get_executor().submit(_run, name))
+
+
+def thumbnail_url(field_file, size, ext='jpg'):
+    """返回合适尺寸缩略图的URL，缩略图尚未生成时返回原图URL"""
+    if not field_file or not field_file.name:
+        return ''
+    name = variant_name(field_file.name, pick_size(size), ext)
+    if default_storage.exists(name):
+        return default_storage.url(name)
+    return field_file.url
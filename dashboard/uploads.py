@@ -0,0 +1,199 @@
+"""音乐分块上传与按内容去重存储
+
+协议：init 创建上传会话 -> 按偏移量逐块追加 -> finalize 校验大小、计算哈希并创建 Music。
+断线后客户端查询会话的 received_bytes，从该偏移量继续上传即可。
+
+音频文件按 SHA-256 存放在 music/blobs/<前两位>/<哈希>-<随机串><扩展名>，内容相同的音乐共用
+同一个 AudioBlob，通过 ref_count 引用计数，计数归零时删除文件。
+新内容的时长、波形和内嵌封面在事务提交后由 audio.py 在后台解析。
+"""
+import hashlib
+import os
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction, IntegrityError
+from django.db.models import F
+
+from .audio import schedule_metadata
+from .models import AudioBlob, Music
+
+MAX_CHUNK_SIZE = getattr(settings, 'MUSIC_UPLOAD_MAX_CHUNK_SIZE', 8 * 1024 * 1024)
+MAX_UPLOAD_SIZE = getattr(settings, 'MUSIC_UPLOAD_MAX_SIZE', 500 * 1024 * 1024)
+UPLOAD_TMP_DIR = os.path.join(settings.MEDIA_ROOT, 'uploads')
+
+# 本进程内各上传会话的增量哈希；会话被其他进程接收过分块或进程重启时，
+# finalize 会重新读取临时文件计算哈希
+_hashers = {}
+_hashers_lock = threading.Lock()
+
+
+class UploadError(Exception):
+    """上传请求不合法"""
+
+
+class OffsetMismatch(UploadError):
+    """分块偏移量与服务器已接收的字节数不一致"""
+
+    def __init__(self, expected):
+        super().__init__(f"偏移量不匹配，应从 {expected} 继续上传")
+        self.expected = expected
+
+
+def part_path(upload):
+    return os.path.join(UPLOAD_TMP_DIR, f'{upload.pk}.part')
+
+
+def append_chunk(upload, offset, chunk):
+    """将一个分块追加到临时文件，同时更新增量哈希
+
+    调用方需在事务中以 select_for_update 锁定 upload，保证同一会话的分块串行写入。
+    """
+    if offset != upload.received_bytes:
+        raise OffsetMismatch(upload.received_bytes)
+    if chunk.size > MAX_CHUNK_SIZE:
+        raise UploadError("分块过大")
+    if upload.received_bytes + chunk.size > upload.total_size:
+        raise UploadError("上传数据超过声明的文件大小")
+
+    os.makedirs(UPLOAD_TMP_DIR, exist_ok=True)
+    path = part_path(upload)
+    with _hashers_lock:
+        state = _hashers.get(upload.pk)
+    if offset == 0:
+        state = [hashlib.sha256(), 0]
+    elif state is not None and state[1] != offset:
+        state = None
+
+    written = 0
+    with open(path, 'r+b' if os.path.exists(path) else 'wb') as f:
+        # 上次写入可能中途失败，以数据库中记录的偏移量为准
+        f.seek(offset)
+        f.truncate()
+        for data in chunk.chunks():
+            f.write(data)
+            if state is not None:
+                state[0].update(data)
+            written += len(data)
+
+    upload.received_bytes = offset + written
+    upload.save(update_fields=['received_bytes', 'updated_at'])
+    with _hashers_lock:
+        if state is None:
+            _hashers.pop(upload.pk, None)
+        else:
+            state[1] = upload.received_bytes
+            _hashers[upload.pk] = state
+    return upload.received_bytes
+
+
+def _file_sha256(path):
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for data in iter(lambda: f.read(1024 * 1024), b''):
+            hasher.update(data)
+    return hasher.hexdigest()
+
+
+def _blob_name(sha256, filename):
+    # 随机串保证每次创建的记录使用新文件名：刚删除的同内容记录的文件在其事务提交后才删除，
+    # 沿用同一文件名会删掉新写入的文件
+    extension = os.path.splitext(filename)[1].lower()[:10]
+    return f'music/blobs/{sha256[:2]}/{sha256}-{uuid.uuid4().hex[:8]}{extension}'
+
+
+def _create_blob(sha256, size, filename, open_content):
+    """存储内容并创建引用计数为 1 的 AudioBlob；并发创建了相同内容时返回 None"""
+    with open_content() as content:
+        name = default_storage.save(_blob_name(sha256, filename), File(content))
+    try:
+        with transaction.atomic():
+            blob = AudioBlob.objects.create(sha256=sha256, file=name, size=size, ref_count=1)
+            schedule_metadata(blob.pk)
+    except IntegrityError:
+        default_storage.delete(name)
+        return None
+    return blob
+
+
+def acquire_blob(sha256, size, filename, open_content):
+    """获取（必要时创建）内容为 sha256 的 AudioBlob，并将引用计数加一
+
+    须在事务中调用，递增持有的行锁保持到引用它的 Music 写入并提交。
+    open_content() 返回文件对象，仅在该内容尚未存储时调用。
+    计数用 UPDATE 原子递增；查到的记录在递增前被 release_blob 删除时（更新 0 行）重新创建。
+    """
+    while True:
+        blob = AudioBlob.objects.filter(sha256=sha256).first()
+        if blob is None:
+            blob = _create_blob(sha256, size, filename, open_content)
+            if blob is not None:
+                return blob
+            # 并发上传了相同内容，重新读取先创建的记录
+            continue
+        if AudioBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1):
+            return blob
+
+
+def release_blob(blob_id):
+    """音乐删除后更新引用计数，归零时删除记录（文件在事务提交后由 post_delete 信号删除）
+
+    锁定该行后按实际引用的音乐数重新计数，与 acquire_blob 的递增串行：递增先提交则计数包含新音乐，
+    删除先提交则递增更新 0 行，acquire_blob 会重新创建。同一首音乐被并发删除两次时信号会触发两次，
+    重新计数不会像单纯减一那样少算。
+    """
+    with transaction.atomic():
+        blob = AudioBlob.objects.select_for_update().filter(pk=blob_id).first()
+        if blob is None:
+            return
+        references = Music.objects.filter(blob_id=blob_id).count()
+        if references:
+            AudioBlob.objects.filter(pk=blob_id).update(ref_count=references)
+        else:
+            blob.delete()
+
+
+def finalize_upload(upload, cover_image=None):
+    """完成上传：校验大小、确定哈希、按内容去重存储并创建 Music"""
+    if upload.received_bytes != upload.total_size:
+        raise UploadError(f"文件尚未上传完成（{upload.received_bytes}/{upload.total_size}）")
+
+    path = part_path(upload)
+    with _hashers_lock:
+        state = _hashers.pop(upload.pk, None)
+    if state is not None and state[1] == upload.received_bytes:
+        sha256 = state[0].hexdigest()
+    else:
+        sha256 = _file_sha256(path)
+
+    blob = acquire_blob(sha256, upload.total_size, upload.filename, lambda: open(path, 'rb'))
+    music = Music(user=upload.user, title=upload.title, artist=upload.artist, blob=blob,
+                  audio_file=blob.file.name)
+    if cover_image is not None:
+        music.cover_image = cover_image
+    elif blob.cover_image:
+        music.cover_image = blob.cover_image.name
+    music.save()
+    upload.delete()
+    transaction.on_commit(lambda: os.path.exists(path) and os.remove(path))
+    return music
+
+
+def store_uploaded_file(music, uploaded_file):
+    """普通表单上传的音频同样按内容去重存储"""
+    hasher = hashlib.sha256()
+    for data in uploaded_file.chunks():
+        hasher.update(data)
+
+    def open_content():
+        uploaded_file.seek(0)
+        return uploaded_file
+
+    blob = acquire_blob(hasher.hexdigest(), uploaded_file.size, uploaded_file.name, open_content)
+    music.blob = blob
+    music.audio_file = blob.file.name
+    if not music.cover_image and blob.cover_image:
+        music.cover_image = blob.cover_image.name
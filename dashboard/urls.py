@@ -1,13 +1,33 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import views, async_views
+
+# ASGI 部署时页面视图使用异步版本（见 async_views.py）
+page_views = async_views if getattr(settings, 'DASHBOARD_ASYNC_VIEWS', False) else views
 
 urlpatterns = [
-    path('', views.dashboard_view, name='dashboard'),          # 仪表盘首页
-    path('location/', views.location_view, name='location'),   # 地址管理
-    path('checkin/', views.checkin_view, name='checkin'),      # 每日打卡
-    path('activity/', views.activity_view, name='activity'),   # 活动记录
+    path('', page_views.dashboard_view, name='dashboard'),          # 仪表盘首页
+    path('location/', page_views.location_view, name='location'),   # 地址管理
+    path('location/<int:location_id>/default/', views.set_default_location, name='set_default_location'),
+    path('checkin/', page_views.checkin_view, name='checkin'),      # 每日打卡
+    path('activity/', page_views.activity_view, name='activity'),   # 活动记录
     path('music/', views.music_view, name='music'),  # 音乐库页面
     path('music/upload/', views.upload_music, name='upload_music'),  # 上传音乐
     path('music/delete/<int:music_id>/', views.delete_music, name='delete_music'),
+    path('music/stream/<int:music_id>/', views.stream_music, name='stream_music'),  # 音乐播放
+    path('music/upload/init/', views.music_upload_init, name='music_upload_init'),  # 分块上传
+    path('music/upload/<uuid:upload_id>/', views.music_upload_status, name='music_upload_status'),
+    path('music/upload/<uuid:upload_id>/chunk/', views.music_upload_chunk, name='music_upload_chunk'),
+    path('music/upload/<uuid:upload_id>/finalize/', views.music_upload_finalize, name='music_upload_finalize'),
+    path('import/', views.import_history_view, name='import_history'),           # 批量导入
+    path('export/', views.export_view, name='export'),                            # 导出足迹
+    path('api/locations/', views.location_list_api, name='location_list_api'),    # 地址列表接口
+    path('api/locations/nearby/', views.location_nearby_api, name='location_nearby_api'),  # 附近地址
+    path('api/checkins/stats/', views.checkin_stats_api, name='checkin_stats_api'),        # 打卡统计
+    path('api/activities/', views.activity_list_api, name='activity_list_api'),   # 活动列表接口
+    path('api/activities/heatmap/', views.activity_heatmap_api, name='activity_heatmap_api'),  # 活动热力图
+    path('api/music/search/', views.music_search_api, name='music_search_api'),     # 音乐搜索
+    path('api/music/suggest/', views.music_suggest_api, name='music_suggest_api'),  # 搜索输入联想
+    path('api/music/<int:music_id>/waveform/', views.music_waveform_api, name='music_waveform_api'),  # 时长和波形
 
 ]
@@ -1,39 +1,43 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.core.exceptions import ValidationError
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.utils import timezone
+from django.views.decorators.http import require_POST
 from datetime import date, timedelta
 
 from .forms import MusicForm
-from .models import Location, CheckIn, Activity, Music
+from .models import Location, CheckIn, CheckInMonthlyStats, Activity, Music
+from .stats import get_user_stats
+from .cache import get_dashboard_summary, get_location_choices
+from .conditional import conditional_page
+from .heatmap import year_heatmap
+from .geo import locations_in_bbox, locations_within_radius, nearest_locations
+from .exporter import CONTENT_TYPES as EXPORT_CONTENT_TYPES, export_lines
+from .importer import KINDS, guess_format, import_records, iter_rows
+from .pagination import paginate_request, parse_page_size
 
 
 @login_required
 def dashboard_view(request):
     """仪表盘首页视图"""
-    today = date.today()
-    # 获取今日打卡状态
-    checkin_status = "已完成" if CheckIn.objects.filter(
-        user=request.user,
-        created_at__date=today
-    ).exists() else "未完成"
-
-    # 获取最近的地址记录
-    recent_location = Location.objects.filter(user=request.user).order_by('-created_at').first()
-
-    # 获取最近的3条活动记录
-    recent_activities = Activity.objects.filter(user=request.user).order_by('-start_time')[:3]
+    today = timezone.localdate()
+    # 今日打卡状态、最近地址、最近3条活动，按用户版本号缓存
+    summary = get_dashboard_summary(request.user, today)
 
-    return render(request, 'dashboard.html', {
+    return render(request, 'dashboard/index.html', {
         'user': request.user,
         'page': 'dashboard',
-        'checkin_status': checkin_status,
-        'recent_location': recent_location,
-        'recent_activities': recent_activities
+        'checkin_status': summary['checkin_status'],
+        'checkin_stats': summary['checkin_stats'],
+        'recent_location': summary['recent_location'],
+        'recent_activities': summary['recent_activities']
     })
 
 
 @login_required
+@conditional_page((Location, 'updated_at'))
 def location_view(request):
     """地址管理视图"""
     if request.method == 'POST':
@@ -53,27 +57,35 @@ def location_view(request):
         except Exception as e:
             messages.error(request, f'添加失败: {str(e)}')
 
-    # 获取用户所有地址
-    locations = Location.objects.filter(user=request.user).order_by('-created_at')
+    # 按游标分页获取用户地址
+    locations = paginate_request(request, Location.objects.filter(user=request.user), 'created_at')
 
-    return render(request, 'dashboard.html', {
+    return render(request, 'dashboard/location.html', {
         'user': request.user,
         'page': 'location',
         'locations': locations
     })
 
 
+@login_required
+@require_POST
+def set_default_location(request, location_id):
+    """设为默认地址（同时取消原默认地址）"""
+    try:
+        Location.set_default(request.user.pk, location_id)
+    except Location.DoesNotExist:
+        raise Http404("地址不存在")
+    messages.success(request, '已设为默认地址')
+    return redirect('location')
+
+
 @login_required
 def checkin_view(request):
     """打卡视图"""
-    today = date.today()
-
-    # 检查今天是否已经打卡
-    if CheckIn.objects.filter(user=request.user, created_at__date=today).exists():
-        messages.info(request, '您今天已经打卡了！')
-        return redirect('dashboard')
+    today = timezone.localdate()
 
     if request.method == 'POST':
+        # 重复打卡由唯一约束在插入时拦截，无需预先查询
         try:
             checkin = CheckIn(
                 user=request.user,
@@ -84,13 +96,23 @@ def checkin_view(request):
             checkin.save()
             messages.success(request, '今日打卡成功！')
             return redirect('dashboard')
+        except ValidationError as e:
+            if getattr(e, 'code', None) == 'duplicate_checkin':
+                messages.info(request, '您今天已经打卡了！')
+                return redirect('dashboard')
+            messages.error(request, f'打卡失败: {str(e)}')
         except Exception as e:
             messages.error(request, f'打卡失败: {str(e)}')
 
+    # 检查今天是否已经打卡
+    elif CheckIn.objects.filter(user=request.user, checkin_date=today).exists():
+        messages.info(request, '您今天已经打卡了！')
+        return redirect('dashboard')
+
     # 获取用户的地址列表供选择
-    locations = Location.objects.filter(user=request.user)
+    locations = get_location_choices(request.user)
 
-    return render(request, 'dashboard.html', {
+    return render(request, 'dashboard/checkin.html', {
         'user': request.user,
         'page': 'checkin',
         'locations': locations
@@ -98,6 +120,7 @@ def checkin_view(request):
 
 
 @login_required
+@conditional_page((Activity, 'created_at'), (Location, 'updated_at'))
 def activity_view(request):
     """活动记录视图"""
     if request.method == 'POST':
@@ -117,25 +140,181 @@ def activity_view(request):
         except Exception as e:
             messages.error(request, f'添加失败: {str(e)}')
 
-    # 获取用户所有活动
-    activities = Activity.objects.filter(user=request.user).order_by('-start_time')
+    # 按游标分页获取用户活动
+    activities = paginate_request(request, Activity.objects.filter(user=request.user), 'start_time')
 
-    return render(request, 'dashboard.html', {
+    return render(request, 'dashboard/activity.html', {
         'user': request.user,
         'page': 'activity',
-        'activities': activities
+        'activities': activities,
+        'locations': get_location_choices(request.user)
+    })
+
+
+@login_required
+@require_POST
+def import_history_view(request):
+    """批量导入活动或打卡记录（文件字段 file，表单字段 kind: activity / checkin）"""
+    upload = request.FILES.get('file')
+    kind = request.POST.get('kind')
+    if upload is None or kind not in KINDS:
+        return JsonResponse({'error': '请上传文件并指定导入类型'}, status=400)
+
+    fmt = request.POST.get('format') or guess_format(upload.name)
+    try:
+        result = import_records(request.user, kind, iter_rows(upload.file, fmt))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse(result.as_dict())
+
+
+@login_required
+def export_view(request):
+    """流式导出足迹（format: csv / ndjson / geojson，kind: all / activity / checkin）"""
+    fmt = request.GET.get('format', 'csv')
+    kind = request.GET.get('kind', 'all')
+    try:
+        lines = export_lines(request.user, fmt, kind)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    response = StreamingHttpResponse(lines, content_type=EXPORT_CONTENT_TYPES[fmt])
+    filename = f"footprint-{timezone.localdate():%Y%m%d}.{'json' if fmt == 'geojson' else fmt}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@login_required
+def location_list_api(request):
+    """地址列表接口（JSON，游标分页）"""
+    page = paginate_request(request, Location.objects.filter(user=request.user), 'created_at')
+    return JsonResponse({
+        'results': [
+            {
+                'id': location.id,
+                'name': location.name,
+                'address': location.address,
+                'latitude': str(location.latitude) if location.latitude is not None else None,
+                'longitude': str(location.longitude) if location.longitude is not None else None,
+                'is_default': location.is_default,
+                'created_at': location.created_at.isoformat(),
+            }
+            for location in page
+        ],
+        'next_cursor': page.next_cursor,
+    })
+
+
+@login_required
+def location_nearby_api(request):
+    """附近地址接口
+
+    bbox=最小纬度,最小经度,最大纬度,最大经度：矩形范围内的地址；
+    lat、lng 加 radius（千米）：半径范围内的地址；lat、lng 加 n：最近的 n 个地址。
+    """
+    queryset = Location.objects.filter(user=request.user)
+    try:
+        if request.GET.get('bbox'):
+            min_lat, min_lng, max_lat, max_lng = (float(v) for v in request.GET['bbox'].split(','))
+            locations = locations_in_bbox(queryset, min_lat, min_lng, max_lat, max_lng)
+        else:
+            lat, lng = float(request.GET['lat']), float(request.GET['lng'])
+            if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+                raise ValueError
+            if request.GET.get('radius'):
+                locations = locations_within_radius(queryset, lat, lng, float(request.GET['radius']))
+            else:
+                locations = nearest_locations(queryset, lat, lng, min(int(request.GET.get('n', 10)), 100))
+    except (KeyError, ValueError):
+        return JsonResponse({'error': '请提供有效的 bbox，或 lat、lng 及 radius / n'}, status=400)
+
+    return JsonResponse({
+        'results': [
+            {
+                'id': location.id,
+                'name': location.name,
+                'address': location.address,
+                'latitude': str(location.latitude),
+                'longitude': str(location.longitude),
+                'distance_km': round(location.distance_km, 3) if hasattr(location, 'distance_km') else None,
+            }
+            for location in locations
+        ]
+    })
+
+
+@login_required
+def checkin_stats_api(request):
+    """打卡统计接口：连续天数及每月各状态次数"""
+    stats = get_user_stats(request.user, timezone.localdate())
+    stats['monthly'] = [
+        {
+            'month': row.month.strftime('%Y-%m'),
+            'completed': row.completed,
+            'late': row.late,
+            'absent': row.absent,
+        }
+        for row in CheckInMonthlyStats.objects.filter(user=request.user)[:parse_page_size(request.GET.get('months'), default=12)]
+    ]
+    return JsonResponse(stats)
+
+
+@login_required
+def activity_heatmap_api(request):
+    """活动热力图接口：指定年份每天各类别的活动次数和总时长（秒）"""
+    today = timezone.localdate()
+    try:
+        year = int(request.GET.get('year', today.year))
+    except ValueError:
+        return JsonResponse({'error': '年份格式错误'}, status=400)
+    if not 1970 <= year <= today.year + 1:
+        return JsonResponse({'error': '年份超出范围'}, status=400)
+    return JsonResponse(year_heatmap(request.user, year, today))
+
+
+@login_required
+def activity_list_api(request):
+    """活动列表接口（JSON，游标分页）"""
+    page = paginate_request(request, Activity.objects.filter(user=request.user), 'start_time')
+    return JsonResponse({
+        'results': [
+            {
+                'id': activity.id,
+                'title': activity.title,
+                'category': activity.category,
+                'location_id': activity.location_id,
+                'start_time': activity.start_time.isoformat(),
+                'end_time': activity.end_time.isoformat(),
+            }
+            for activity in page
+        ],
+        'next_cursor': page.next_cursor,
     })
 # dashboard/views.py
+import os
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from .models import Music
+from django.db import transaction
+from django.http import Http404, JsonResponse
+from django.views.decorators.http import require_GET, require_POST
+from django.urls import reverse
+from .models import Music, MusicUpload
 from .forms import MusicForm
+from .pagination import parse_page_size
+from .search import search_music, suggest_music
+from .streaming import ranged_file_response
+from .uploads import (
+    MAX_UPLOAD_SIZE, UploadError, OffsetMismatch, append_chunk, finalize_upload, store_uploaded_file
+)
 
 @login_required
+@conditional_page((Music, 'uploaded_at'))
 def music_view(request):
     """音乐库页面，展示所有音乐"""
-    musics = Music.objects.filter(user=request.user).order_by('-uploaded_at')
+    # 时长和波形来自 AudioBlob 上预先解析的元数据，不读取音频文件
+    musics = Music.objects.filter(user=request.user).select_related('blob').order_by('-uploaded_at')
     music_form = MusicForm()
     return render(request, 'index.html', {
         'page': 'music',
@@ -151,7 +330,9 @@ def upload_music(request):
         if form.is_valid():
             music = form.save(commit=False)
             music.user = request.user  # 关联当前用户
-            music.save()
+            with transaction.atomic():
+                store_uploaded_file(music, form.cleaned_data['audio_file'])
+                music.save()
             messages.success(request, '音乐上传成功！')
         else:
             messages.error(request, '上传失败，请检查文件格式和大小')
@@ -166,4 +347,150 @@ def delete_music(request, music_id):
         messages.success(request, '音乐已删除')
     except Exception as e:
         messages.error(request, f'删除失败：{str(e)}')
-    return redirect('music')
\ No newline at end of file
+    return redirect('music')
+
+
+@login_required
+def stream_music(request, music_id):
+    """音乐播放（支持 Range 分段请求，只能访问自己的音乐）"""
+    music = get_object_or_404(Music, id=music_id, user=request.user)
+    try:
+        path = music.audio_file.path
+        if not os.path.isfile(path):
+            raise Http404("音频文件不存在")
+    except (ValueError, NotImplementedError):
+        raise Http404("音频文件不存在")
+    return ranged_file_response(request, path)
+
+
+@login_required
+@require_POST
+def music_upload_init(request):
+    """分块上传：创建上传会话"""
+    title = (request.POST.get('title') or '').strip()
+    filename = (request.POST.get('filename') or '').strip()
+    try:
+        total_size = int(request.POST.get('size', ''))
+    except ValueError:
+        return JsonResponse({'error': '缺少文件大小'}, status=400)
+    if not title or not filename:
+        return JsonResponse({'error': '标题和文件名不能为空'}, status=400)
+    if not 0 < total_size <= MAX_UPLOAD_SIZE:
+        return JsonResponse({'error': '文件大小超出限制'}, status=400)
+
+    upload = MusicUpload.objects.create(
+        user=request.user,
+        title=title[:200],
+        artist=(request.POST.get('artist') or '')[:200],
+        filename=filename[:255],
+        total_size=total_size
+    )
+    return JsonResponse({'upload_id': str(upload.pk), 'offset': 0}, status=201)
+
+
+@login_required
+@require_GET
+def music_upload_status(request, upload_id):
+    """分块上传：查询已接收的字节数，用于断点续传"""
+    upload = get_object_or_404(MusicUpload, pk=upload_id, user=request.user)
+    return JsonResponse({
+        'upload_id': str(upload.pk),
+        'offset': upload.received_bytes,
+        'size': upload.total_size
+    })
+
+
+@login_required
+@require_POST
+def music_upload_chunk(request, upload_id):
+    """分块上传：在 offset 处追加一个分块（表单字段 offset，文件字段 chunk）"""
+    chunk = request.FILES.get('chunk')
+    try:
+        offset = int(request.POST.get('offset', ''))
+    except ValueError:
+        return JsonResponse({'error': '缺少偏移量'}, status=400)
+    if chunk is None:
+        return JsonResponse({'error': '缺少分块数据'}, status=400)
+
+    with transaction.atomic():
+        upload = get_object_or_404(
+            MusicUpload.objects.select_for_update(), pk=upload_id, user=request.user
+        )
+        try:
+            received = append_chunk(upload, offset, chunk)
+        except OffsetMismatch as e:
+            return JsonResponse({'error': str(e), 'offset': e.expected}, status=409)
+        except UploadError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse({'offset': received, 'size': upload.total_size})
+
+
+@login_required
+@require_POST
+def music_upload_finalize(request, upload_id):
+    """分块上传：完成上传并创建音乐记录"""
+    with transaction.atomic():
+        upload = get_object_or_404(
+            MusicUpload.objects.select_for_update(), pk=upload_id, user=request.user
+        )
+        try:
+            music = finalize_upload(upload, cover_image=request.FILES.get('cover_image'))
+        except UploadError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse({'id': music.id, 'title': music.title}, status=201)
+
+
+@login_required
+@require_GET
+def music_search_api(request):
+    """音乐搜索接口：q 为关键词（多个词用空格分隔），page 从 1 开始，size 为每页条数"""
+    query = request.GET.get('q', '')
+    size = parse_page_size(request.GET.get('size'))
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        return JsonResponse({'error': '无效的页码'}, status=400)
+    musics, has_next = search_music(request.user, query, offset=(page - 1) * size, limit=size)
+    return JsonResponse({
+        'results': [
+            {
+                'id': music.id,
+                'title': music.title,
+                'artist': music.artist,
+                'uploaded_at': music.uploaded_at.isoformat(),
+                'duration': music.blob.duration if music.blob else None,
+                'stream_url': reverse('stream_music', args=[music.id]),
+            }
+            for music in musics
+        ],
+        'next_page': page + 1 if has_next else None,
+    })
+
+
+@login_required
+@require_GET
+def music_suggest_api(request):
+    """音乐搜索输入联想：返回最多 n 条（默认 8）标题和艺术家"""
+    limit = parse_page_size(request.GET.get('n'), default=8)
+    return JsonResponse({'results': suggest_music(request.user, request.GET.get('q', ''), limit=limit)})
+
+
+@login_required
+@require_GET
+def music_waveform_api(request, music_id):
+    """音乐的时长、格式和波形峰值（0~255）；元数据尚未解析完成时返回 202"""
+    music = get_object_or_404(Music.objects.select_related('blob'), pk=music_id, user=request.user)
+    blob = music.blob
+    if blob is None:
+        raise Http404("没有音频元数据")
+    if blob.metadata_at is None:
+        return JsonResponse({'status': 'pending'}, status=202)
+    return JsonResponse({
+        'status': 'ready',
+        'format': blob.format,
+        'duration': blob.duration,
+        'bitrate': blob.bitrate,
+        'sample_rate': blob.sample_rate,
+        'channels': blob.channels,
+        'peaks': list(bytes(blob.peaks)) if blob.peaks is not None else None,
+    })
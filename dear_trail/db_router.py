@@ -0,0 +1,80 @@
+"""主从数据库路由：读请求走只读副本，写入和写入后的读取走主库
+
+只有经过 ReplicaPinMiddleware 的请求才会读副本；管理命令、后台任务等请求之外的
+代码始终使用主库，不会读到复制延迟之前的旧数据。
+
+读你所写：POST 等非安全方法的请求全程使用主库；请求中发生写入后，其余查询也改用主库，
+并由中间件设置 cookie，在 DATABASE_REPLICA_PIN_SECONDS 秒内该浏览器的请求都读主库，
+用户刷新页面时一定能看到自己刚提交的打卡。
+"""
+import contextvars
+import random
+
+from django.conf import settings
+from django.db import connections
+
+PRIMARY = 'default'
+REPLICAS = list(getattr(settings, 'DATABASE_REPLICAS', []))
+# 读副本的应用，其他应用（auth、sessions 等）始终读主库
+ROUTED_APPS = set(getattr(settings, 'DATABASE_REPLICA_APPS', ['dashboard', 'accounts']))
+PIN_SECONDS = getattr(settings, 'DATABASE_REPLICA_PIN_SECONDS', 10)
+PIN_COOKIE = getattr(settings, 'DATABASE_REPLICA_PIN_COOKIE', 'dt_primary')
+
+
+class RoutingState:
+    """一个请求的路由状态；线程池中的查询复制上下文后共享同一个对象"""
+    __slots__ = ('pinned', 'wrote')
+
+    def __init__(self, pinned):
+        self.pinned = pinned
+        self.wrote = False
+
+    @property
+    def use_primary(self):
+        return self.pinned or self.wrote
+
+
+_state = contextvars.ContextVar('db_routing_state', default=None)
+
+
+def begin_request(pinned):
+    """请求开始时调用，返回 (状态, 用于 end_request 的令牌)"""
+    state = RoutingState(pinned)
+    return state, _state.set(state)
+
+
+def end_request(token):
+    _state.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """DATABASE_ROUTERS 中使用；没有配置副本时所有查询都走主库"""
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if (
+            not REPLICAS
+            or state is None
+            or state.use_primary
+            or model._meta.app_label not in ROUTED_APPS
+            # 主库事务中的读取必须看到本事务的写入
+            or connections[PRIMARY].in_atomic_block
+        ):
+            return PRIMARY
+        return random.choice(REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY, *REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # 副本的表结构由主库复制而来
+        return db == PRIMARY
@@ -0,0 +1,116 @@
+"""请求级性能统计：SQL 次数与耗时、模板渲染耗时
+
+当前请求的统计对象保存在 ContextVar 中。所有数据库连接建立时都会挂上同一个
+execute_wrapper，只有当前上下文中存在统计对象时才计时。sync_to_async 和
+asyncio.gather 会复制上下文，所以异步视图在线程池中执行的查询（见 dashboard/aio.py）
+也会计入发起它的请求。模板渲染耗时由 InstrumentedDjangoTemplates 后端记录。
+"""
+import contextvars
+import re
+import threading
+import time
+from collections import Counter
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template.backends.django import DjangoTemplates, Template
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+_IN_LIST = re.compile(r'\(\s*%s(\s*,\s*%s)*\s*\)')
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SPACES = re.compile(r'\s+')
+
+
+def normalize_sql(sql):
+    """去掉参数值差异：字面量替换为 ?，IN 列表合并，空白压缩"""
+    sql = _IN_LIST.sub('(...)', sql)
+    sql = _LITERAL.sub('?', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+class RequestMetrics:
+    """一次请求的统计数据（线程安全，异步视图可能在多个线程中并发查询）"""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.statements = Counter()
+        self._lock = threading.Lock()
+
+    def add_query(self, sql, elapsed):
+        with self._lock:
+            self.queries += 1
+            self.db_time += elapsed
+            self.statements[normalize_sql(sql)] += 1
+
+    def add_template(self, elapsed):
+        with self._lock:
+            self.template_time += elapsed
+
+    def repeated(self, threshold):
+        """同一条规范化 SQL 执行次数超过 threshold 的语句（疑似 N+1）"""
+        return [(sql, count) for sql, count in self.statements.most_common() if count > threshold]
+
+
+def current_metrics():
+    return _current.get()
+
+
+def start_metrics():
+    """开始统计当前请求，返回 (统计对象, 用于 stop_metrics 的令牌)"""
+    # 本模块导入前已建立的连接（如启动检查时打开的）不会触发 connection_created
+    for connection in connections.all(initialized_only=True):
+        _install(connection)
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def stop_metrics(token):
+    _current.reset(token)
+
+
+def _record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.add_query(sql, time.perf_counter() - started)
+
+
+def _install(connection):
+    # 连接对象按线程创建，重连时会再次触发，避免重复挂载
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    _install(connection)
+
+
+class InstrumentedTemplate(Template):
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.add_template(time.perf_counter() - started)
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """记录顶层模板渲染耗时的 Django 模板后端（include 的子模板计入父模板）"""
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return InstrumentedTemplate(super().get_template(template_name).template, self)
@@ -1,4 +1,28 @@
 # 正确的 middleware.py 内容（无语法错误）
+import json
+import logging
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date
+
+from . import db_router
+from .instrumentation import start_metrics, stop_metrics
+from .static_assets import StaticAssetIndex
+
+logger = logging.getLogger('dear_trail.perf')
+
+# 统计的请求比例（0~1），生产环境可调低以减少开销
+SAMPLE_RATE = getattr(settings, 'PERF_SAMPLE_RATE', 1.0)
+# 同一条 SQL 在一个请求内执行超过该次数时记录 N+1 警告
+NPLUSONE_THRESHOLD = getattr(settings, 'PERF_NPLUSONE_THRESHOLD', 5)
+# 是否在响应中添加 Server-Timing 头
+SERVER_TIMING = getattr(settings, 'PERF_SERVER_TIMING', True)
+
+
 class StaticFileCharsetMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
@@ -8,4 +32,167 @@ class StaticFileCharsetMiddleware:
         # 仅对CSS文件添加UTF-8编码头
         if request.path.startswith('/static/') and request.path.endswith('.css'):
             response['Content-Type'] = 'text/css; charset=utf-8'
-        return response
\ No newline at end of file
+        return response
+
+
+class StaticAssetMiddleware:
+    """在 STATIC_URL 下发送静态文件（见 static_assets.py），不经过会话、认证等后续中间件
+
+    按 Accept-Encoding 选择预压缩版本；带内容哈希的文件名响应一年的 immutable 缓存。
+    小文件直接从内存发送，大文件用文件响应（WSGI 服务器支持时使用 sendfile）。
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefix = settings.STATIC_URL if settings.STATIC_URL.startswith('/') else '/' + settings.STATIC_URL
+        self.index = StaticAssetIndex()
+
+    def __call__(self, request):
+        if request.method in ('GET', 'HEAD') and request.path_info.startswith(self.prefix):
+            asset = self.index.get(request.path_info[len(self.prefix):])
+            if asset is not None:
+                return self.serve(request, asset)
+        return self.get_response(request)
+
+    def serve(self, request, asset):
+        encoding, path, size, data = asset.choose(request.META.get('HTTP_ACCEPT_ENCODING'))
+        etag = asset.etag(encoding)
+        if etag in request.META.get('HTTP_IF_NONE_MATCH', ''):
+            response = HttpResponseNotModified()
+        elif request.method == 'HEAD':
+            response = HttpResponse(content_type=asset.content_type)
+            response['Content-Length'] = size
+        elif data is not None:
+            response = HttpResponse(data, content_type=asset.content_type)
+        else:
+            response = FileResponse(open(path, 'rb'), content_type=asset.content_type)
+            response['Content-Length'] = size
+        if encoding and response.status_code == 200:
+            response['Content-Encoding'] = encoding
+        if len(asset.variants) > 1:
+            response['Vary'] = 'Accept-Encoding'
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(asset.mtime)
+        response['Cache-Control'] = asset.cache_control
+        return response
+
+
+class PerformanceMiddleware:
+    """请求性能统计：SQL 次数与耗时、模板渲染耗时、总耗时
+
+    结果写入 Server-Timing 响应头和 dear_trail.perf 日志（每个请求一行 JSON），
+    重复执行的 SQL 超过阈值时记录警告。应放在 MIDDLEWARE 的第一位，以便包含其他中间件的查询。
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self._sampled():
+            return self.get_response(request)
+        metrics, token = start_metrics()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            stop_metrics(token)
+        self._finish(request, response, metrics, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        if not self._sampled():
+            return await self.get_response(request)
+        metrics, token = start_metrics()
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            stop_metrics(token)
+        self._finish(request, response, metrics, time.perf_counter() - started)
+        return response
+
+    def _sampled(self):
+        return SAMPLE_RATE >= 1 or random.random() < SAMPLE_RATE
+
+    def _finish(self, request, response, metrics, elapsed):
+        # 流式响应的内容在返回后才生成，这里只统计到视图返回为止
+        def ms(seconds):
+            return round(seconds * 1000, 2)
+
+        if SERVER_TIMING:
+            response['Server-Timing'] = (
+                f'db;dur={ms(metrics.db_time)};desc="{metrics.queries} queries", '
+                f'tpl;dur={ms(metrics.template_time)}, '
+                f'total;dur={ms(elapsed)}'
+            )
+
+        repeated = metrics.repeated(NPLUSONE_THRESHOLD)
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': ms(elapsed),
+            'db_ms': ms(metrics.db_time),
+            'queries': metrics.queries,
+            'template_ms': ms(metrics.template_time),
+            'repeated_queries': len(repeated),
+        }
+        logger.info(json.dumps(record, ensure_ascii=False))
+        for sql, count in repeated:
+            logger.warning(json.dumps({
+                'event': 'n_plus_one',
+                'method': request.method,
+                'path': request.path,
+                'count': count,
+                'sql': sql,
+            }, ensure_ascii=False))
+
+
+class ReplicaPinMiddleware:
+    """读你所写：决定本次请求是否可以读只读副本（见 dear_trail/db_router.py）
+
+    带有 pin cookie 或使用非安全方法的请求全程读主库；请求中发生了写入时设置 pin cookie，
+    之后 DATABASE_REPLICA_PIN_SECONDS 秒内的请求也读主库。应放在 SessionMiddleware 之前，
+    会话保存等写入也会被记录。
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state, token = db_router.begin_request(self._pinned(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            db_router.end_request(token)
+        return self._finish(response, state)
+
+    async def __acall__(self, request):
+        state, token = db_router.begin_request(self._pinned(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            db_router.end_request(token)
+        return self._finish(response, state)
+
+    def _pinned(self, request):
+        return request.method not in ('GET', 'HEAD', 'OPTIONS') or db_router.PIN_COOKIE in request.COOKIES
+
+    def _finish(self, response, state):
+        if state.wrote and db_router.REPLICAS:
+            response.set_cookie(
+                db_router.PIN_COOKIE, '1', max_age=db_router.PIN_SECONDS, httponly=True, samesite='Lax'
+            )
+        return response
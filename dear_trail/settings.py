@@ -30,6 +30,9 @@ INSTALLED_APPS = [
 
 # 中间件配置
 MIDDLEWARE = [
+    'dear_trail.middleware.StaticAssetMiddleware',  # 静态文件（不计入性能统计，不经过会话等中间件）
+    'dear_trail.middleware.PerformanceMiddleware',  # 请求性能统计（放在其他中间件之前）
+    'dear_trail.middleware.ReplicaPinMiddleware',  # 读写分离：写入后一段时间内读主库
     # 'dear_trail.middleware.StaticFileCharsetMiddleware'
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -46,9 +49,9 @@ ROOT_URLCONF = 'dear_trail.urls'
 # 模板配置
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Django 模板后端的子类，额外记录模板渲染耗时（见 dear_trail/instrumentation.py）
+        'BACKEND': 'dear_trail.instrumentation.InstrumentedDjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
@@ -56,6 +59,14 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            # 显式启用缓存加载器：模板只解析一次，编译结果在进程内复用
+            # （runserver 检测到模板修改时会自动清空；耗时对比见 bench_templates 命令）
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
         },
     },
 ]
@@ -73,10 +84,75 @@ DATABASES = {
         'PORT': '3306',
         'OPTIONS': {
             'charset': 'utf8mb4',
-        }
+        },
+        # 连接复用按别名配置：主库连接保持 60 秒，复用前检查连接是否可用
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# 只读副本：环境变量 DB_REPLICA_HOSTS 为逗号分隔的副本主机，依次生成 replica1、replica2……
+# 副本只执行读查询、不持有事务状态，连接保持更久；测试时镜像主库
+DATABASE_REPLICAS = []
+for _index, _host in enumerate(filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), start=1):
+    DATABASES[f'replica{_index}'] = {
+        **DATABASES['default'],
+        'HOST': _host.strip(),
+        'CONN_MAX_AGE': 300,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{_index}')
+DATABASE_ROUTERS = ['dear_trail.db_router.PrimaryReplicaRouter']
+# 请求中发生写入后，该浏览器在多少秒内的请求都读主库（应大于副本的复制延迟）
+DATABASE_REPLICA_PIN_SECONDS = 10
+
+# 缓存配置（本地内存；多进程部署可改为文件缓存 django.core.cache.backends.filebased.FileBasedCache）
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'dear_trail',
+    }
+}
+# 仪表盘按用户缓存的过期时间（秒）
+DASHBOARD_CACHE_TIMEOUT = 300
+# 使用 uvicorn 等 ASGI 服务器部署时设置环境变量 DASHBOARD_ASYNC_VIEWS=1，页面视图改用异步版本
+DASHBOARD_ASYNC_VIEWS = os.environ.get('DASHBOARD_ASYNC_VIEWS') == '1'
+
+# 请求性能统计（dear_trail.middleware.PerformanceMiddleware）
+PERF_SAMPLE_RATE = 1.0          # 统计的请求比例，生产环境可设为 0.05 等
+PERF_NPLUSONE_THRESHOLD = 5     # 同一条 SQL 在一个请求内超过该次数时记录警告
+PERF_SERVER_TIMING = True       # 响应中添加 Server-Timing 头
+
+# 日志：性能统计每个请求输出一行 JSON
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'dear_trail.perf': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
+# 密码哈希：第一个为当前使用的算法，其余算法的旧哈希在登录成功后自动转换
+# OWASP 建议 PBKDF2-SHA256 不少于 600000 次迭代（Django 默认 1000000 次，验证更慢）
+LOGIN_PBKDF2_ITERATIONS = 600000
+PASSWORD_HASHERS = [
+    'accounts.hashers.ConfigurablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+# 登录保护：哈希计算线程池大小与最大排队数，按 IP / 用户名的令牌桶 (容量, 填满秒数)
+LOGIN_HASH_WORKERS = 2
+LOGIN_HASH_QUEUE = 32
+LOGIN_THROTTLE_IP = (20, 60)
+LOGIN_THROTTLE_USERNAME = (5, 60)
+LOGIN_TRUST_X_FORWARDED_FOR = False
+
 # 密码验证
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -99,9 +175,18 @@ STATICFILES_DIRS = [
 ]
 # STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+# collectstatic 时文件名加内容哈希并预生成 .gz / .br（安装 brotli 时）压缩版本，
+# 由 dear_trail.middleware.StaticAssetMiddleware 发送（DEBUG 模式下直接读取源文件）
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'dear_trail.static_assets.CompressedManifestStaticFilesStorage'},
+}
 # 媒体文件配置（用户上传的文件）
 MEDIA_URL = './media/'
 MEDIA_ROOT = BASE_DIR / 'templates/media'
+# 音乐播放由前端服务器发送文件时启用其一（nginx 需配置 internal 的 location 指向 MEDIA_ROOT）
+# MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+# MEDIA_SENDFILE_HEADER = 'X-Sendfile'
 
 
 # 登录配置
@@ -0,0 +1,185 @@
+"""静态文件：collectstatic 时加指纹并预压缩，运行时按 Accept-Encoding 选择版本
+
+CompressedManifestStaticFilesStorage 在 Django 的 ManifestStaticFilesStorage（文件名带内容哈希，
+如 css/auth.3f2a1b.css）基础上，为文本类文件额外生成 .gz 和 .br（安装了 brotli 时）压缩版本。
+StaticAssetIndex 在启动时扫描 STATIC_ROOT，把小文件及其压缩版本读入内存；
+带哈希的文件名内容永不改变，响应 Cache-Control: immutable，浏览器再次访问时不会发出请求。
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import posixpath
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:  # brotli 为可选依赖
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.mjs', '.map', '.json', '.svg', '.txt', '.html', '.xml', '.ico'}
+# 小于该大小的文件压缩收益不足以抵消解压开销
+MIN_COMPRESS_SIZE = 256
+# 读入内存的单个文件大小上限，超过时用文件响应发送（WSGI 服务器可用 sendfile）
+MAX_MEMORY_SIZE = getattr(settings, 'STATIC_MEMORY_MAX_SIZE', 512 * 1024)
+# 不带哈希的文件名（如直接引用的 css/auth.css）的缓存时间
+UNHASHED_MAX_AGE = getattr(settings, 'STATIC_UNHASHED_MAX_AGE', 60)
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# Content-Encoding 与文件后缀，按优先顺序排列
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+
+def compress_file(path):
+    """为文件生成 .gz / .br 版本，压缩后体积没有明显减小时不保留，返回生成的文件列表"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < MIN_COMPRESS_SIZE:
+        return []
+    variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', brotli.compress(data, quality=11)))
+    written = []
+    for suffix, compressed in variants:
+        if len(compressed) < len(data) * 0.95:
+            with open(path + suffix, 'wb') as f:
+                f.write(compressed)
+            written.append(path + suffix)
+    return written
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """collectstatic 时生成带内容哈希的文件名，并为文本文件预生成压缩版本"""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        names = set(paths) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if os.path.splitext(name)[1].lower() in COMPRESSIBLE_EXTENSIONS and self.exists(name):
+                compress_file(self.path(name))
+
+
+class StaticAsset:
+    """一个静态文件及其各编码版本"""
+
+    def __init__(self, path, immutable):
+        self.path = path
+        self.immutable = immutable
+        content_type, _ = mimetypes.guess_type(path)
+        content_type = content_type or 'application/octet-stream'
+        if content_type.startswith('text/') or content_type in ('application/javascript', 'application/json',
+                                                               'image/svg+xml'):
+            content_type += '; charset=utf-8'
+        self.content_type = content_type
+        stat = os.stat(path)
+        self.mtime = stat.st_mtime
+        # 编码 -> (文件路径, 大小, 内存中的内容或 None)
+        self.variants = {None: self._load(path)}
+        for encoding, suffix in ENCODINGS:
+            if os.path.exists(path + suffix):
+                self.variants[encoding] = self._load(path + suffix)
+        self.etag_base = self._etag_base(stat)
+
+    def _load(self, path):
+        size = os.path.getsize(path)
+        data = None
+        if size <= MAX_MEMORY_SIZE:
+            with open(path, 'rb') as f:
+                data = f.read()
+        return path, size, data
+
+    def _etag_base(self, stat):
+        data = self.variants[None][2]
+        if data is not None:
+            return hashlib.md5(data, usedforsecurity=False).hexdigest()[:16]
+        return f'{stat.st_size:x}-{stat.st_mtime_ns:x}'
+
+    @property
+    def cache_control(self):
+        if self.immutable:
+            return f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+        return f'public, max-age={UNHASHED_MAX_AGE}'
+
+    def choose(self, accept_encoding):
+        """按 Accept-Encoding 选择版本，返回 (编码或 None, 文件路径, 大小, 内容)"""
+        if len(self.variants) > 1:
+            accepted = accepted_encodings(accept_encoding)
+            for encoding, _ in ENCODINGS:
+                if encoding in self.variants and encoding in accepted:
+                    return (encoding, *self.variants[encoding])
+        return (None, *self.variants[None])
+
+    def etag(self, encoding):
+        # 不同编码的内容不同，ETag 也必须不同
+        return f'"{self.etag_base}-{encoding}"' if encoding else f'"{self.etag_base}"'
+
+
+def accepted_encodings(header):
+    """解析 Accept-Encoding，返回可接受（q > 0）的编码集合"""
+    accepted, rejected, wildcard = set(), set(), False
+    for item in (header or '').split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding == '*':
+            wildcard = q > 0
+        elif q > 0:
+            accepted.add(coding)
+        else:
+            rejected.add(coding)
+    if wildcard:
+        accepted |= {encoding for encoding, _ in ENCODINGS} - rejected
+    return accepted
+
+
+class StaticAssetIndex:
+    """URL 路径（相对 STATIC_URL）到 StaticAsset 的映射
+
+    生产环境（DEBUG=False）启动时扫描 STATIC_ROOT 一次；开发环境按需从 STATICFILES_DIRS
+    和各应用的 static 目录查找源文件，不缓存、不标记 immutable，修改后立即生效。
+    """
+
+    def __init__(self, root=None, debug=None):
+        self.debug = settings.DEBUG if debug is None else debug
+        self.root = root or settings.STATIC_ROOT
+        self.assets = {}
+        if not self.debug and self.root and os.path.isdir(self.root):
+            self._scan()
+
+    def _hashed_names(self):
+        # 清单在存储初始化时读取，不存在时为空
+        return set(ManifestStaticFilesStorage(location=self.root).hashed_files.values())
+
+    def _scan(self):
+        hashed = self._hashed_names()
+        suffixes = tuple(suffix for _, suffix in ENCODINGS)
+        for directory, _, files in os.walk(self.root):
+            for filename in files:
+                if filename.endswith(suffixes) or filename == 'staticfiles.json':
+                    continue
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, self.root).replace(os.sep, '/')
+                self.assets[name] = StaticAsset(path, immutable=name in hashed)
+
+    def get(self, name):
+        name = posixpath.normpath(name).lstrip('/')
+        if name.startswith('..'):
+            return None
+        if not self.debug:
+            return self.assets.get(name)
+        path = finders.find(name)
+        return StaticAsset(path, immutable=False) if path else None
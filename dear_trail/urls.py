@@ -12,7 +12,4 @@ urlpatterns = [
 # 开发环境下提供媒体文件访问
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
-urlpatterns += static(
-    settings.STATIC_URL,
-    document_root=settings.STATICFILES_DIRS[0]  # 指向你的static源目录
-)
\ No newline at end of file
+# 静态文件由 dear_trail.middleware.StaticAssetMiddleware 发送
\ No newline at end of file